@@ -0,0 +1,48 @@
+"""like and comment counters
+
+Revision ID: 7cd7d17fa03a
+Revises: 845c292ab8c2
+Create Date: 2026-10-18 16:21:07.553190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7cd7d17fa03a'
+down_revision: Union[str, Sequence[str], None] = '845c292ab8c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (таблица, счётчик, таблица-источник, её внешний ключ) - как COUNTERS в pdd_app/db/counters.py
+COUNTERS = [
+    ('videos', 'likes_count', 'likes', 'video_id'),
+    ('videos', 'comments_count', 'comments', 'video_id'),
+    ('questions', 'likes_count', 'likes', 'question_id'),
+    ('questions', 'comments_count', 'comments', 'question_id'),
+    ('comments', 'likes_count', 'likes', 'comment_id'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ADD COLUMN с константным DEFAULT в Postgres 11+ не переписывает таблицу
+    for table, column, _, _ in COUNTERS:
+        op.add_column(table, sa.Column(column, sa.Integer(), server_default='0', nullable=False))
+    # начальные значения по существующим строкам; дальше их ведёт приложение
+    for table, column, source, foreign_key in COUNTERS:
+        op.execute(
+            f'UPDATE {table} SET {column} = counts.n '
+            f'FROM (SELECT {foreign_key} AS id, count(*) AS n FROM {source} '
+            f'WHERE {foreign_key} IS NOT NULL GROUP BY {foreign_key}) AS counts '
+            f'WHERE {table}.id = counts.id'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column, _, _ in reversed(COUNTERS):
+        op.drop_column(table, column)
@@ -0,0 +1,58 @@
+"""hot path indexes
+
+Revision ID: 845c292ab8c2
+Revises: 3c9e1f7a2b64
+Create Date: 2026-10-18 13:05:44.918320
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '845c292ab8c2'
+down_revision: Union[str, Sequence[str], None] = '3c9e1f7a2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (имя, таблица, колонки, частичное условие)
+INDEXES = [
+    ('ix_questions_category_id_difficulty', 'questions', ['category_id', 'difficulty'], None),
+    ('ix_questions_difficulty', 'questions', ['difficulty'], None),
+    ('ix_answer_options_question_id', 'answer_options', ['question_id'], None),
+    ('ix_question_exam_exam_id', 'question_exam', ['exam_id'], None),
+    ('ix_exams_user_id_started_at', 'exams', ['user_id', 'started_at'], None),
+    ('ix_comments_question_id_created_at', 'comments', ['question_id', 'created_at'], 'question_id IS NOT NULL'),
+    ('ix_comments_video_id_created_at', 'comments', ['video_id', 'created_at'], 'video_id IS NOT NULL'),
+    ('ix_comments_user_id', 'comments', ['user_id'], None),
+    ('ix_likes_user_id', 'likes', ['user_id'], None),
+    ('ix_likes_question_id', 'likes', ['question_id'], 'question_id IS NOT NULL'),
+    ('ix_likes_video_id', 'likes', ['video_id'], 'video_id IS NOT NULL'),
+    ('ix_likes_comment_id', 'likes', ['comment_id'], 'comment_id IS NOT NULL'),
+    ('ix_refresh_token_token', 'refresh_token', ['token'], None),
+    ('ix_refresh_token_user_id', 'refresh_token', ['user_id'], None),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в таблицу, но не работает внутри транзакции.
+    # Если построение упало, Postgres оставляет INVALID индекс - его надо удалить вручную
+    # (DROP INDEX CONCURRENTLY), иначе if_not_exists его пропустит.
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text(where) if where else None,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
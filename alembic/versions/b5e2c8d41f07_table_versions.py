@@ -0,0 +1,38 @@
+"""table versions
+
+Revision ID: b5e2c8d41f07
+Revises: 7cd7d17fa03a
+Create Date: 2026-10-18 19:42:15.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e2c8d41f07'
+down_revision: Union[str, Sequence[str], None] = '7cd7d17fa03a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# как TRACKED в pdd_app/db/table_versions.py
+TRACKED = ['answer_options', 'categories', 'questions', 'videos']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    table_versions = op.create_table(
+        'table_versions',
+        sa.Column('table_name', sa.String(length=64), nullable=False),
+        sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('table_name'),
+    )
+    # строки заранее: UPDATE в транзакции записи не должен их создавать
+    op.bulk_insert(table_versions, [{'table_name': name, 'version': 1} for name in TRACKED])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('table_versions')
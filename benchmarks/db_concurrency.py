@@ -0,0 +1,193 @@
+"""Нагрузочный бенчмарк CRUD-роутов под смешанной конкурентной нагрузкой.
+
+    uvicorn pdd_app.main:app --port 8000 &
+    python -m benchmarks.db_concurrency --output db.json
+    python -m benchmarks.db_concurrency --output db-new.json --baseline db.json
+
+Клиенты гоняют взвешенную смесь чтений (и, с --writes, создание/удаление категорий)
+против запущенного сервера. Параллельно зонд раз в --probe-interval дёргает /docs,
+которому база не нужна: его задержка показывает, насколько запросы к БД
+блокируют event loop воркера. Запуск на коммите до и после перехода на
+AsyncSession и сравнение через --baseline дают разницу.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+import uuid
+from datetime import datetime
+
+import httpx
+
+READS = [
+    # (вес, метод, путь)
+    (4, 'GET', '/category/'),
+    (3, 'GET', '/questions/?limit=20'),
+    (2, 'GET', '/exam/'),
+    (2, 'GET', '/videos/'),
+    (2, 'GET', '/questions/{question_id}'),
+]
+PROBE_PATH = '/docs'
+
+
+def percentile(values, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def summarize(latencies):
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.5), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 2) if latencies else None,
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else None,
+    }
+
+
+async def pick_question_id(client: httpx.AsyncClient):
+    response = await client.get('/questions/?limit=1')
+    if response.status_code == 200 and response.json():
+        return response.json()[0]['id']
+    return 1
+
+
+async def write_cycle(client: httpx.AsyncClient):
+    created = await client.post('/category/', json={'category_name': f'bench-{uuid.uuid4().hex[:12]}'})
+    if created.status_code == 200:
+        await client.delete(f'/category/{created.json()["id"]}/')
+    return created
+
+
+async def client_loop(client, rng, routes, writes: float, deadline: float, latencies, errors):
+    weights = [weight for weight, _, _ in routes]
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        if writes and rng.random() < writes:
+            name = 'write category'
+            try:
+                response = await write_cycle(client)
+            except httpx.HTTPError:
+                response = None
+        else:
+            _, method, name = rng.choices(routes, weights)[0]
+            try:
+                response = await client.request(method, name)
+            except httpx.HTTPError:
+                response = None
+        latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+        if response is None or response.status_code >= 500:
+            errors[name] = errors.get(name, 0) + 1
+
+
+async def probe_loop(client, interval: float, deadline: float, latencies):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            await client.get(PROBE_PATH)
+        except httpx.HTTPError:
+            pass
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+
+
+async def run_level(url: str, concurrency: int, duration: float, writes: float,
+                    probe_interval: float, seed: int):
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        question_id = await pick_question_id(client)
+        routes = [(weight, method, path.format(question_id=question_id)) for weight, method, path in READS]
+
+        latencies, errors, probe = {}, {}, []
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(
+            probe_loop(client, probe_interval, deadline, probe),
+            *(client_loop(client, random.Random(seed + i), routes, writes, deadline, latencies, errors)
+              for i in range(concurrency)),
+        )
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(values) for values in latencies.values())
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "requests_per_s": round(total / elapsed, 1),
+        "errors": sum(errors.values()),
+        "all": summarize([value for values in latencies.values() for value in values]),
+        "probe": summarize(probe),
+        "routes": {name: {**summarize(values), "errors": errors.get(name, 0)}
+                   for name, values in sorted(latencies.items())},
+    }
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created_at": datetime.utcnow().isoformat(),
+        "url": args.url,
+        "duration_s": args.duration,
+        "writes": args.writes,
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {row['concurrency']: row for row in json.load(f)['results']}
+    print(f'\nсравнение с {baseline_path}')
+    for row in results:
+        old = baseline.get(row['concurrency'])
+        if old is None:
+            continue
+        print(f'c={row["concurrency"]:<4} rps {old["requests_per_s"]:>8} -> {row["requests_per_s"]:<8} '
+              f'p95 {old["all"]["p95_ms"]} -> {row["all"]["p95_ms"]} ms, '
+              f'probe p95 {old["probe"]["p95_ms"]} -> {row["probe"]["p95_ms"]} ms')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.db_concurrency')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, action='append')
+    parser.add_argument('--duration', type=float, default=10.0, help='секунд на каждый уровень')
+    parser.add_argument('--writes', type=float, default=0.0,
+                        help='доля итераций создание+удаление категории (0..1)')
+    parser.add_argument('--probe-interval', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_db.json')
+    parser.add_argument('--baseline', help='JSON прошлого запуска для сравнения')
+    args = parser.parse_args(argv)
+
+    results = []
+    for concurrency in args.concurrency or [1, 8, 32, 64]:
+        row = asyncio.run(run_level(args.url, concurrency, args.duration, args.writes,
+                                    args.probe_interval, args.seed))
+        results.append(row)
+        print(f'c={concurrency:<4} {row["requests_per_s"]:>8} rps  p50 {row["all"]["p50_ms"]} '
+              f'p95 {row["all"]["p95_ms"]} p99 {row["all"]["p99_ms"]} ms  '
+              f'probe p95 {row["probe"]["p95_ms"]} ms  errors {row["errors"]}')
+
+    with open(args.output, 'w') as f:
+        json.dump({"meta": metadata(args), "results": results}, f, indent=2)
+    print(f'результаты: {args.output}')
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Бенчмарк /model/predict по стадиям: decode, preprocess, forward, postprocess.
+
+    python -m benchmarks.inference --output bench.json
+    python -m benchmarks.inference --output new.json --baseline bench.json
+
+Перебирает размер батча и torch.set_num_threads на синтетических знаках
+разных разрешений и форматов. Результат - JSON, его можно сравнивать между коммитами.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import torch
+
+from benchmarks.preprocess import synthetic_image
+from pdd_app.ml import preprocess
+from pdd_app.ml.backends import BACKENDS, load_backend
+from pdd_app.ml.model import CheckImage, class_names
+
+CASES = [
+    (64, 64, 'PNG'),
+    (320, 240, 'JPEG'),
+    (1280, 720, 'JPEG'),
+    (1920, 1080, 'WEBP'),
+    (4032, 3024, 'JPEG'),
+]
+STAGES = ('decode', 'preprocess', 'forward', 'postprocess')
+
+
+def load_model(backend: str, random_weights: bool):
+    if random_weights:
+        model = CheckImage()
+        model.eval()
+        return model
+    return load_backend(backend, torch.device('cpu'))
+
+
+def run_once(model, payloads, buffers):
+    timings = {}
+
+    started = time.perf_counter()
+    images = [preprocess.open_image(data) for data in payloads]
+    timings['decode'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = buffers.to_tensor([preprocess.resize(image) for image in images])
+    timings['preprocess'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with torch.no_grad():
+        outputs = model(batch)
+    timings['forward'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    probs = torch.softmax(outputs, dim=1)
+    confidence, class_id = torch.max(probs, dim=1)
+    predictions = [{"name": class_names[c], "confidence": f"{round(p * 100, 2)}%"}
+                   for c, p in zip(class_id.tolist(), confidence.tolist())]
+    timings['postprocess'] = time.perf_counter() - started
+    return timings, predictions
+
+
+@lru_cache(maxsize=None)
+def cached_image(case) -> bytes:
+    return synthetic_image(*case)
+
+
+def bench_case(model, case, batch_size: int, threads: int, repeat: int):
+    torch.set_num_threads(threads)
+    payloads = [cached_image(case)] * batch_size
+    buffers = preprocess.BatchBuffer(batch_size)
+
+    _, predictions = run_once(model, payloads, buffers)
+    samples = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        timings, _ = run_once(model, payloads, buffers)
+        for stage, seconds in timings.items():
+            samples[stage].append(seconds * 1000 / batch_size)
+
+    row = {
+        "image": f'{case[0]}x{case[1]} {case[2]}',
+        "bytes": len(payloads[0]),
+        "batch_size": batch_size,
+        "threads": threads,
+        # ответ модели: при сравнении с baseline видно, что оптимизация не поменяла результат
+        "prediction": predictions[0],
+    }
+    for stage, values in samples.items():
+        row[f'{stage}_ms'] = round(statistics.median(values), 4)
+    row['total_ms'] = round(sum(row[f'{stage}_ms'] for stage in STAGES), 4)
+    row['images_per_s'] = round(1000 / row['total_ms'], 1) if row['total_ms'] else None
+    return row
+
+
+def metadata(backend: str, random_weights: bool):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created_at": datetime.utcnow().isoformat(),
+        "backend": backend,
+        "random_weights": random_weights,
+        "torch": torch.__version__,
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {(r['image'], r['batch_size'], r['threads']): r for r in json.load(f)['results']}
+    print(f'\nсравнение с {baseline_path} (total_ms на изображение, + значит медленнее)')
+    for row in results:
+        old = baseline.get((row['image'], row['batch_size'], row['threads']))
+        if old is None or not old['total_ms']:
+            continue
+        change = (row['total_ms'] - old['total_ms']) / old['total_ms'] * 100
+        print(f'{row["image"]:>16} b={row["batch_size"]:<3} t={row["threads"]:<2} '
+              f'{old["total_ms"]:8.3f} -> {row["total_ms"]:8.3f} ms ({change:+.1f}%)')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.inference')
+    parser.add_argument('--backend', default='eager', choices=list(BACKENDS))
+    parser.add_argument('--random-weights', action='store_true',
+                        help='не читать melis_model.pth (для замеров скорости веса не важны)')
+    parser.add_argument('--batch-size', type=int, action='append')
+    parser.add_argument('--threads', type=int, action='append')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', default='bench_inference.json')
+    parser.add_argument('--baseline', help='JSON прошлого запуска для сравнения')
+    args = parser.parse_args(argv)
+
+    batch_sizes = args.batch_size or [1, 8, 32]
+    threads = args.threads or sorted({1, max(1, (os.cpu_count() or 1) // 2), os.cpu_count() or 1})
+    model = load_model(args.backend, args.random_weights)
+
+    results = []
+    for case in CASES:
+        for batch_size in batch_sizes:
+            for thread_count in threads:
+                row = bench_case(model, case, batch_size, thread_count, args.repeat)
+                results.append(row)
+                print(f'{row["image"]:>16} b={batch_size:<3} t={thread_count:<2} '
+                      + ' '.join(f'{stage} {row[f"{stage}_ms"]:.3f}' for stage in STAGES)
+                      + f' | {row["total_ms"]:.3f} ms/img')
+
+    with open(args.output, 'w') as f:
+        json.dump({"meta": metadata(args.backend, args.random_weights), "results": results}, f, indent=2)
+    print(f'результаты: {args.output}')
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
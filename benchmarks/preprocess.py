@@ -0,0 +1,125 @@
+"""Сравнение препроцессинга: torchvision transform vs draft-декодирование в uint8-буфер.
+
+    python -m benchmarks.preprocess --repeat 50
+
+Каждый путь запускается в отдельном процессе, пик памяти берётся из VmHWM (Linux).
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+# (ширина, высота, формат)
+CASES = [
+    (640, 480, 'JPEG'),
+    (1920, 1080, 'JPEG'),
+    (4032, 3024, 'JPEG'),
+    (1024, 1024, 'PNG'),
+]
+
+
+def synthetic_image(width: int, height: int, fmt: str) -> bytes:
+    rng = np.random.default_rng(0)
+    # плавный градиент + шум, чтобы JPEG/PNG сжимались как фотографии, а не как шум
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    options = {'quality': 90} if fmt == 'JPEG' else {}
+    Image.fromarray(pixels).save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def memory_kb(field: str) -> int:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return 0
+
+
+def reset_peak_memory():
+    # сбрасывает VmHWM до текущего RSS
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+
+
+def run_baseline(payloads):
+    import torch
+    from pdd_app.ml.model import transform
+
+    return torch.stack([transform(Image.open(io.BytesIO(data)).convert("RGB")) for data in payloads])
+
+
+def run_fast(payloads, buffers):
+    from pdd_app.ml.preprocess import decode
+
+    return buffers.to_tensor([decode(data) for data in payloads])
+
+
+def measure(path: str, case, data: bytes, repeat: int, batch_size: int, queue):
+    import torch
+    from pdd_app.ml.preprocess import BatchBuffer
+
+    torch.set_num_threads(1)
+    payloads = [data] * batch_size
+    buffers = BatchBuffer(batch_size)
+    run = (lambda: run_baseline(payloads)) if path == 'baseline' else (lambda: run_fast(payloads, buffers))
+
+    run()
+    reset_peak_memory()
+    rss_before = memory_kb('VmRSS')
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000 / batch_size)
+    peak = memory_kb('VmHWM')
+
+    queue.put({
+        "path": path,
+        "image": f'{case[0]}x{case[1]} {case[2]}',
+        "bytes": len(payloads[0]),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(sorted(timings)[int(len(timings) * 0.95) - 1], 3),
+        "peak_rss_mb": round(peak / 1024, 1),
+        "peak_rss_growth_mb": round((peak - rss_before) / 1024, 1),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.preprocess')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--output', help='куда сохранить результаты в JSON')
+    args = parser.parse_args(argv)
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for case in CASES:
+        data = synthetic_image(*case)
+        for path in ('baseline', 'fast'):
+            queue = context.Queue()
+            process = context.Process(target=measure,
+                                      args=(path, case, data, args.repeat, args.batch_size, queue))
+            process.start()
+            results.append(queue.get())
+            process.join()
+            row = results[-1]
+            print(f'{row["image"]:>16} {path:>8}: {row["median_ms"]:8.2f} ms/img '
+                  f'(p95 {row["p95_ms"]:.2f}), peak RSS {row["peak_rss_mb"]} MB '
+                  f'(+{row["peak_rss_growth_mb"]} MB)')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,32 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from typing import List
 
 from pdd_app.db.models import AnswerOption, Question
-from pdd_app.db.database import SessionLocal
+from pdd_app.db.database import get_db, get_read_db
 from pdd_app.db.schema import AnswerOptionCreateSchema
-
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from pdd_app.db.response_cache import response_cache
 
 
 answer_router = APIRouter(prefix="/answers", tags=["AnswerOptions"])
 
 
 @answer_router.get("/{question_id}", response_model=List[AnswerOptionCreateSchema])
-def list_answers(question_id: int, db: Session = Depends(get_db)):
-    question = db.query(Question).filter(Question.id == question_id).first()
+async def list_answers(question_id: int, db: AsyncSession = Depends(get_read_db)):
+    # вопрос и варианты одним LEFT JOIN: проверка существования не стоит отдельного запроса
+    question = (await db.scalars(
+        select(Question).options(joinedload(Question.answer_options)).where(Question.id == question_id)
+    )).unique().first()
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
-    return question.options
+    return question.answer_options
 
 
 @answer_router.post("/{question_id}", response_model=AnswerOptionCreateSchema)
-def create_answer(question_id: int, answer: AnswerOptionCreateSchema, db: Session = Depends(get_db)):
-    question = db.query(Question).filter(Question.id == question_id).first()
+async def create_answer(question_id: int, answer: AnswerOptionCreateSchema, db: AsyncSession = Depends(get_db)):
+    question = await db.scalar(select(Question).where(Question.id == question_id))
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
 
@@ -38,30 +36,33 @@ def create_answer(question_id: int, answer: AnswerOptionCreateSchema, db: Sessio
         question_id=question_id
     )
     db.add(new_answer)
-    db.commit()
-    db.refresh(new_answer)
+    await db.commit()
+    await response_cache.invalidate('answer_options')
+    await db.refresh(new_answer)
     return new_answer
 
 
 @answer_router.put("/{answer_id}", response_model=AnswerOptionCreateSchema)
-def update_answer(answer_id: int, answer: AnswerOptionCreateSchema, db: Session = Depends(get_db)):
-    db_answer = db.query(AnswerOption).filter(AnswerOption.id == answer_id).first()
+async def update_answer(answer_id: int, answer: AnswerOptionCreateSchema, db: AsyncSession = Depends(get_db)):
+    db_answer = await db.scalar(select(AnswerOption).where(AnswerOption.id == answer_id))
     if not db_answer:
         raise HTTPException(status_code=404, detail="Answer not found")
 
     db_answer.text = answer.text
     db_answer.is_correct = answer.is_correct
     db.add(db_answer)
-    db.commit()
-    db.refresh(db_answer)
+    await db.commit()
+    await response_cache.invalidate('answer_options')
+    await db.refresh(db_answer)
     return db_answer
 
 
 @answer_router.delete("/{answer_id}")
-def delete_answer(answer_id: int, db: Session = Depends(get_db)):
-    db_answer = db.query(AnswerOption).filter(AnswerOption.id == answer_id).first()
+async def delete_answer(answer_id: int, db: AsyncSession = Depends(get_db)):
+    db_answer = await db.scalar(select(AnswerOption).where(AnswerOption.id == answer_id))
     if not db_answer:
         raise HTTPException(status_code=404, detail="Answer not found")
-    db.delete(db_answer)
-    db.commit()
+    await db.delete(db_answer)
+    await db.commit()
+    await response_cache.invalidate('answer_options')
     return {"message": "Deleted"}
@@ -1,9 +1,11 @@
+import asyncio
 from datetime import timedelta, datetime
 from fastapi import HTTPException, Depends, APIRouter
 from pdd_app.db.models import User, Refresh
 from pdd_app.db.schema import UserSchema, UserProfileLoginSchema
-from pdd_app.db.database import SessionLocal
-from sqlalchemy.orm import Session
+from pdd_app.db.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from passlib.context import CryptContext
 from jose import jwt
@@ -13,14 +15,6 @@ from pdd_app.config import (ALGORITHM, SECRET_KEY,
                                REFRESH_TOKEN_LIFETIME)
 
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -46,9 +40,9 @@ def create_refresh_token(data: dict):
 
 
 @auth_router.post('/register', response_model=dict)
-async def register(user: UserSchema, db: Session = Depends(get_db)):
-    user_db = db.query(User).filter(User.username == user.username).first()
-    email_db = db.query(User).filter(User.email == user.email).first()
+async def register(user: UserSchema, db: AsyncSession = Depends(get_db)):
+    user_db = await db.scalar(select(User).where(User.username == user.username))
+    email_db = await db.scalar(select(User).where(User.email == user.email))
 
     if user_db:
         raise HTTPException(status_code=400, detail='username бар экен')
@@ -56,7 +50,8 @@ async def register(user: UserSchema, db: Session = Depends(get_db)):
     if email_db:
         raise HTTPException(status_code=400, detail='email бар экен')
 
-    hash_password = get_password_hash(user.password)
+    # bcrypt считается сотни миллисекунд, не держим на нём event loop
+    hash_password = await asyncio.to_thread(get_password_hash, user.password)
 
     new_user = User(
         first_name=user.first_name,
@@ -68,43 +63,43 @@ async def register(user: UserSchema, db: Session = Depends(get_db)):
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return {"message": "Registered"}
 
 
 @auth_router.post('/login')
-async def login(form_data: UserProfileLoginSchema, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.password):
+async def login(form_data: UserProfileLoginSchema, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    if not user or not await asyncio.to_thread(verify_password, form_data.password, user.password):
         raise HTTPException(status_code=401, detail='Маалымат туура эмес')
     access_token = create_access_token({"sub": user.username})
     refresh_token = create_refresh_token({"sub": user.username})
 
     new_token = Refresh(user_id = user.id, token = refresh_token)
     db.add(new_token)
-    db.commit()
+    await db.commit()
 
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type":"bearer"}
 
 
 @auth_router.post('/logout', response_model=dict)
-async def logout(refresh_token: str,db: Session = Depends(get_db)):
-    stored_token = db.query(Refresh).filter(Refresh.token == refresh_token).first()
+async def logout(refresh_token: str,db: AsyncSession = Depends(get_db)):
+    stored_token = await db.scalar(select(Refresh).where(Refresh.token == refresh_token))
 
     if not stored_token:
         raise HTTPException(status_code=401, detail='Маалымат туура эмес')
 
-    db.delete(stored_token)
-    db.commit()
+    await db.delete(stored_token)
+    await db.commit()
 
     return {"message": "Вышли"}
 
 
 @auth_router.post('refresh/')
-async def refresh(refresh_token: str,db: Session = Depends(get_db)):
-    stored_token = db.query(Refresh).filter(Refresh.token == refresh_token).first()
+async def refresh(refresh_token: str,db: AsyncSession = Depends(get_db)):
+    stored_token = await db.scalar(select(Refresh).where(Refresh.token == refresh_token))
 
     if not stored_token:
         raise HTTPException(status_code=401, detail='Маалымат туура эмес')
@@ -1,38 +1,37 @@
-from fastapi import HTTPException, Depends, APIRouter
+from fastapi import HTTPException, Depends, APIRouter, Request
 from pdd_app.db.models import Category
 from pdd_app.db.schema import CategorySchema, CategoryCreateSchema
-from pdd_app.db.database import SessionLocal
-from sqlalchemy.orm import Session
-from typing import List
+from pdd_app.db.database import get_db, get_read_db
+from pdd_app.db.pagination import Page, PageParams, paginate
+from pdd_app.db.response_cache import response_cache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 category_router = APIRouter(prefix='/category', tags=['Category'])
 
 
 @category_router.post('/', response_model=CategorySchema)
-async def create_category(category: CategoryCreateSchema, db: Session = Depends(get_db)):
+async def create_category(category: CategoryCreateSchema, db: AsyncSession = Depends(get_db)):
     category_db = Category(category_name=category.category_name)
     db.add(category_db)
-    db.commit()
-    db.refresh(category_db)
+    await db.commit()
+    await db.refresh(category_db)
+    await response_cache.invalidate('categories')
     return category_db
 
 
-@category_router.get('/', response_model=List[CategorySchema])
-async def list_category(db: Session = Depends(get_db)):
-    return db.query(Category).all()
+@category_router.get('/', response_model=Page[CategorySchema])
+async def list_category(request: Request, page: PageParams = Depends(),
+                        db: AsyncSession = Depends(get_read_db)):
+    return await response_cache.response(
+        request, db, 'category.list', ['categories'],
+        lambda: paginate(db, select(Category), Category.id, page), Page[CategorySchema])
 
 
 @category_router.get('/{category_id}/')
-async def detail_category(category_id: int, db: Session = Depends(get_db)):
-    category_db = db.query(Category).filter(Category.id==category_id).first()
+async def detail_category(category_id: int, db: AsyncSession = Depends(get_read_db)):
+    category_db = await db.scalar(select(Category).where(Category.id==category_id))
     if category_db is None:
         raise HTTPException(status_code= 401, detail= 'Андай маалымат жок')
     return category_db
@@ -40,22 +39,24 @@ async def detail_category(category_id: int, db: Session = Depends(get_db)):
 
 @category_router.put('/{category_id}/', response_model=dict)
 async def update_category(category: CategorySchema, category_id: int,
-                          db: Session = Depends(get_db)):
-    category_db = db.query(Category).filter(Category.id == category_id).first()
+                          db: AsyncSession = Depends(get_db)):
+    category_db = await db.scalar(select(Category).where(Category.id == category_id))
     if category_db is None:
         raise HTTPException(status_code=401, detail='Андай маалымат жок')
     category_db.category_name = category.category_name
     db.add(category_db)
-    db.commit()
-    db.refresh(category_db)
+    await db.commit()
+    await db.refresh(category_db)
+    await response_cache.invalidate('categories')
     return {'message': 'Updated'}
 
 
 @category_router.delete('/{category_id}/')
-async def delete_category( category_id: int, db: Session = Depends(get_db)):
-    category_db = db.query(Category).filter(Category.id == category_id).first()
+async def delete_category( category_id: int, db: AsyncSession = Depends(get_db)):
+    category_db = await db.scalar(select(Category).where(Category.id == category_id))
     if category_db is None:
         raise HTTPException(status_code=401, detail='Андай маалымат жок')
-    db.delete(category_db)
-    db.commit()
+    await db.delete(category_db)
+    await db.commit()
+    await response_cache.invalidate('categories')
     return {'message': 'Deleted'}
\ No newline at end of file
@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from pdd_app.config import EXPORT_YIELD_PER
+from pdd_app.db.database import read_sessionmaker
+from pdd_app.db.models import Exam, ExamStatus, PddClass, User
+
+export_router = APIRouter(prefix='/export', tags=['Export'])
+
+
+class ExportFormat(str, Enum):
+    csv = 'csv'
+    ndjson = 'ndjson'
+
+
+MEDIA_TYPES = {
+    ExportFormat.csv: 'text/csv; charset=utf-8',
+    ExportFormat.ndjson: 'application/x-ndjson',
+}
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+async def _stream_rows(sessions, query, fmt: ExportFormat):
+    # строки идут из серверного курсора пачками по yield_per, ORM-объекты не создаются
+    columns = [column.name for column in query.selected_columns]
+    async with sessions() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_YIELD_PER))
+        if fmt == ExportFormat.csv:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            async for rows in result.partitions():
+                writer.writerows([[_value(value) for value in row] for row in rows])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            async for rows in result.partitions():
+                yield ''.join(
+                    json.dumps(dict(zip(columns, map(_value, row))), ensure_ascii=False) + '\n'
+                    for row in rows
+                )
+
+
+def _export(request: Request, name: str, query, fmt: ExportFormat):
+    return StreamingResponse(
+        _stream_rows(read_sessionmaker(request), query, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{name}.{fmt.value}"'},
+    )
+
+
+def _date_range(query, column, date_from: Optional[datetime], date_to: Optional[datetime]):
+    if date_from is not None:
+        query = query.where(column >= date_from)
+    if date_to is not None:
+        query = query.where(column < date_to)
+    return query
+
+
+@export_router.get('/exams')
+async def export_exams(
+    request: Request,
+    format: ExportFormat = Query(ExportFormat.csv),
+    date_from: Optional[datetime] = Query(None, description='started_at >= date_from'),
+    date_to: Optional[datetime] = Query(None, description='started_at < date_to'),
+    status: Optional[ExamStatus] = Query(None),
+):
+    query = _date_range(select(Exam.__table__).order_by(Exam.id), Exam.started_at, date_from, date_to)
+    if status is not None:
+        query = query.where(Exam.status == status)
+    return _export(request, 'exams', query, format)
+
+
+@export_router.get('/pdd_classes')
+async def export_pdd_classes(
+    request: Request,
+    format: ExportFormat = Query(ExportFormat.csv),
+    date_from: Optional[datetime] = Query(None, description='created_date >= date_from'),
+    date_to: Optional[datetime] = Query(None, description='created_date < date_to'),
+    label: Optional[str] = Query(None, description='predicted_label'),
+):
+    query = _date_range(select(PddClass.__table__).order_by(PddClass.id),
+                        PddClass.created_date, date_from, date_to)
+    if label is not None:
+        query = query.where(PddClass.predicted_label == label)
+    return _export(request, 'pdd_classes', query, format)
+
+
+@export_router.get('/user_profile')
+async def export_users(
+    request: Request,
+    format: ExportFormat = Query(ExportFormat.csv),
+    date_from: Optional[datetime] = Query(None, description='created_at >= date_from'),
+    date_to: Optional[datetime] = Query(None, description='created_at < date_to'),
+):
+    # без хэшей паролей
+    query = select(User.id, User.username, User.email, User.first_name, User.last_name,
+                   User.age, User.created_at).order_by(User.id)
+    return _export(request, 'user_profile', _date_range(query, User.created_at, date_from, date_to), format)
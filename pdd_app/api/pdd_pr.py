@@ -1,133 +1,176 @@
-import io
-from pathlib import Path
-import torch
-import torch.nn as nn
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from torchvision import transforms
-from PIL import Image
-
-# ================= PATH =================
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-MODEL_PATH = BASE_DIR / "melis_model.pth"
+import asyncio
+import json
+import zipfile
+from typing import List
+from fastapi import APIRouter, File, Query, Request, UploadFile, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
+
+from pdd_app.api.uploads import IMAGE_UPLOAD_OPENAPI, read_image_upload
+from pdd_app.config import (PREDICT_BATCH_MAX_FILES, PREDICT_BATCH_WINDOW, PREDICT_MAX_UPLOAD_BYTES,
+                            PREDICT_VIDEO_SAMPLE_FPS, PREDICT_VIDEO_MIN_CONFIDENCE,
+                            PREDICT_VIDEO_MAX_BYTES)
+from pdd_app.ml.runtime import runtime
 
 model_router = APIRouter(prefix='/model', tags=['Model'])
 
-# ================= CLASSES =================
-class_names = [
-    'Ограничение скорости (20 км/ч)',
-    'Ограничение скорости (30 км/ч)',
-    'Ограничение скорости (50 км/ч)',
-    'Ограничение скорости (60 км/ч)',
-    'Ограничение скорости (70 км/ч)',
-    'Ограничение скорости (80 км/ч)',
-    'Конец ограничения скорости (80 км/ч)',
-    'Ограничение скорости (100 км/ч)',
-    'Ограничение скорости (120 км/ч)',
-    'Обгон запрещён',
-    'Обгон запрещён для ТС более 3,5 тонн',
-    'Главная дорога на следующем перекрёстке',
-    'Главная дорога',
-    'Уступите дорогу',
-    'Стоп',
-    'Движение запрещено',
-    'Движение ТС более 3,5 тонн запрещено',
-    'Въезд запрещён',
-    'Общее предупреждение',
-    'Опасный поворот налево',
-    'Опасный поворот направо',
-    'Двойной поворот',
-    'Неровная дорога',
-    'Скользкая дорога',
-    'Сужение дороги справа',
-    'Дорожные работы',
-    'Светофорное регулирование',
-    'Пешеходы',
-    'Дети',
-    'Велосипедисты',
-    'Осторожно: лёд / снег',
-    'Дикие животные',
-    'Конец всех ограничений скорости и обгона',
-    'Поворот направо',
-    'Поворот налево',
-    'Движение прямо',
-    'Движение прямо или направо',
-    'Движение прямо или налево',
-    'Держаться правой стороны',
-    'Держаться левой стороны',
-    'Круговое движение',
-    'Конец запрета обгона',
-    'Конец запрета обгона для ТС более 3,5 тонн'
-]
-
-# ================= TRANSFORM =================
-transform = transforms.Compose([
-    transforms.Resize((128, 128)),
-    transforms.ToTensor()
-])
-
-# ================= MODEL =================
-class CheckImage(nn.Module):
-    def __init__(self):
-        super().__init__()
-
-        # 🔴 ИМЕНА СЛОЁВ ОСТАВЛЕНЫ КАК В .pth
-        self.first = nn.Sequential(
-            nn.Conv2d(3, 32, kernel_size=3, padding=1),
-            nn.ReLU(),
-            nn.MaxPool2d(2),
-            nn.Dropout2d(0.25),
-
-            nn.Conv2d(32, 64, kernel_size=3, padding=1),
-            nn.ReLU(),
-            nn.MaxPool2d(2),
-            nn.Dropout2d(0.25),
-
-            nn.AdaptiveAvgPool2d((1, 1))  # ✅ ИСПРАВЛЕНИЕ
-        )
-
-        self.second = nn.Sequential(
-            nn.Flatten(),
-            nn.Linear(64, 128),
-            nn.ReLU(),
-            nn.Dropout(0.5),
-            nn.Linear(128, 43)
-        )
-
-    def forward(self, x):
-        x = self.first(x)
-        x = self.second(x)
-        return x
-
-
-# ================= DEVICE =================
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-
-# ================= LOAD MODEL =================
-model = CheckImage()
-model.load_state_dict(torch.load(MODEL_PATH, map_location=device))
-model.to(device)
-model.eval()
+
+async def ensure_ready():
+    try:
+        await runtime.wait_ready()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f'Модель недоступна: {e}')
+
+
+# ================= BULK =================
+def _is_zip(file: UploadFile):
+    file.file.seek(0)
+    result = zipfile.is_zipfile(file.file)
+    file.file.seek(0)
+    return result
+
+
+def _count_images(files: List[UploadFile]):
+    total = 0
+    for file in files:
+        if _is_zip(file):
+            with zipfile.ZipFile(file.file) as archive:
+                total += sum(1 for info in archive.infolist() if not info.is_dir())
+            file.file.seek(0)
+        else:
+            total += 1
+    return total
+
+
+def _iter_images(files: List[UploadFile]):
+    # читаем по одному файлу, целиком в память попадает только текущее изображение;
+    # слишком большие файлы не читаем вовсе (data=None)
+    for file in files:
+        if _is_zip(file):
+            with zipfile.ZipFile(file.file) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    if info.file_size > PREDICT_MAX_UPLOAD_BYTES:
+                        yield info.filename, None
+                    else:
+                        yield info.filename, archive.read(info)
+        elif file.size is not None and file.size > PREDICT_MAX_UPLOAD_BYTES:
+            yield file.filename, None
+        else:
+            yield file.filename, file.file.read()
+
+
+async def _predict_one(index: int, filename: str, data):
+    line = {"index": index, "filename": filename}
+    if data is None:
+        line["error"] = f'Файл больше {PREDICT_MAX_UPLOAD_BYTES // (1024 * 1024)} МБ'
+        return line
+    if not data:
+        line["error"] = 'Изображение не получено'
+        return line
+    try:
+        class_id, confidence = await runtime.predict(data)
+    except Exception as e:
+        line["error"] = str(e)
+        return line
+    line.update(runtime.format_prediction(class_id, confidence))
+    return line
+
+
+async def _stream_predictions(files: List[UploadFile]):
+    pending = set()
+    index = 0
+    try:
+        async for filename, data in iterate_in_threadpool(_iter_images(files)):
+            pending.add(asyncio.ensure_future(_predict_one(index, filename, data)))
+            index += 1
+            # не держим в памяти больше PREDICT_BATCH_WINDOW изображений
+            while len(pending) >= PREDICT_BATCH_WINDOW:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield json.dumps(task.result(), ensure_ascii=False) + '\n'
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield json.dumps(task.result(), ensure_ascii=False) + '\n'
+    finally:
+        for task in pending:
+            task.cancel()
+
 
 # ================= API =================
-@model_router.post('/predict')
-async def check_image(file: UploadFile = File(...)):
+@model_router.post('/predict', openapi_extra=IMAGE_UPLOAD_OPENAPI)
+async def check_image(request: Request):
+    data = await read_image_upload(request)
+
+    await ensure_ready()
     try:
-        data = await file.read()
-        if not data:
-            raise HTTPException(status_code=400, detail='Изображение не получено')
+        class_id, confidence = await runtime.predict(data)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        image = Image.open(io.BytesIO(data)).convert("RGB")
-        img_tensor = transform(image).unsqueeze(0).to(device)
+    return runtime.format_prediction(class_id, confidence)
 
-        with torch.no_grad():
-            outputs = model(img_tensor)
-            probs = torch.softmax(outputs, dim=1)
-            confidence, class_id = torch.max(probs, dim=1)
 
-        return {
-            "name": class_names[class_id.item()],
-            "confidence": f"{round(confidence.item() * 100, 2)}%"
-        }
+@model_router.post('/predict/batch')
+async def check_images(files: List[UploadFile] = File(...)):
+    try:
+        total = await asyncio.to_thread(_count_images, files)
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if total == 0:
+        raise HTTPException(status_code=400, detail='Изображение не получено')
+    if total > PREDICT_BATCH_MAX_FILES:
+        raise HTTPException(status_code=413,
+                            detail=f'Слишком много изображений (максимум {PREDICT_BATCH_MAX_FILES})')
+
+    await ensure_ready()
+    return StreamingResponse(_stream_predictions(files), media_type='application/x-ndjson')
+
+
+@model_router.post('/predict/video')
+async def check_video(
+    file: UploadFile = File(...),
+    sample_fps: float = Query(PREDICT_VIDEO_SAMPLE_FPS, gt=0, le=30),
+    min_confidence: float = Query(PREDICT_VIDEO_MIN_CONFIDENCE, ge=0, le=1),
+):
+    if not file.size:
+        raise HTTPException(status_code=400, detail='Видео не получено')
+    if file.size > PREDICT_VIDEO_MAX_BYTES:
+        raise HTTPException(status_code=413,
+                            detail=f'Видео больше {PREDICT_VIDEO_MAX_BYTES // (1024 * 1024)} МБ')
+
+    await ensure_ready()
+    # модуль тянет torch: импорт после загрузки модели, как в runtime
+    from pdd_app.ml.video import decode_errors
 
+    try:
+        return await runtime.recognize_video(file.file, sample_fps, min_confidence)
+    except ImportError:
+        raise HTTPException(status_code=501, detail='Для видео нужен PyAV: pip install av')
+    except decode_errors() as e:
+        raise HTTPException(status_code=400, detail=f'Не удалось обработать видео: {e}')
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@model_router.get('/cache')
+async def cache_stats():
+    await ensure_ready()
+    stats = runtime.cache.stats()
+    stats["perceptual"] = runtime.phash.stats() if runtime.phash is not None else None
+    return stats
+
+
+@model_router.get('/history')
+async def history_stats():
+    if runtime.history is None:
+        raise HTTPException(status_code=404, detail='История предсказаний отключена')
+    return runtime.history.stats()
+
+
+@model_router.get('/ready')
+async def model_ready():
+    return JSONResponse(runtime.status(), status_code=200 if runtime.ready else 503)
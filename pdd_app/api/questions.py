@@ -1,52 +1,144 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Request
+from fastapi.responses import JSONResponse, Response
+from enum import Enum
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from typing import List, Optional
 
+from pdd_app.config import QUESTION_IMPORT_MAX_BYTES
 from pdd_app.db.models import Question, AnswerOption, User
-from pdd_app.db.database import SessionLocal
-from pdd_app.db.schema import QuestionSchema, AnswerOptionSchema
+from pdd_app.db.database import get_db, get_read_db
+from pdd_app.db.schema import QuestionSchema, QuestionDetailSchema, AnswerOptionSchema
+from pdd_app.db.question_bank import question_bank
+from pdd_app.db.response_cache import response_cache
+from pdd_app.db.question_import import QuestionImportError, parse, validate, import_questions
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+question_router = APIRouter(prefix="/questions", tags=["Questions"])
 
 
-question_router = APIRouter(prefix="/questions", tags=["Questions"])
+class QuestionEmbed(str, Enum):
+    answer_options = 'answer_options'
+    category = 'category'
+
+
+# теги кэша ответов (pdd_app.db.response_cache) для встроенных связей
+EMBED_TAGS = {QuestionEmbed.answer_options: 'answer_options', QuestionEmbed.category: 'categories'}
+
 
+def question_select(embed: List[QuestionEmbed]):
+    """select(Question) с подгрузкой связей из embed за фиксированное число запросов.
 
-@question_router.get("/", response_model=List[QuestionSchema])
-def list_questions(
+    category (many-to-one) приходит JOIN'ом в том же запросе, answer_options -
+    одним SELECT ... WHERE question_id IN (...) на всю страницу: два запроса
+    при любом размере страницы вместо 1 + N.
+    """
+    query = select(Question)
+    if QuestionEmbed.category in embed:
+        query = query.options(joinedload(Question.category))
+    if QuestionEmbed.answer_options in embed:
+        query = query.options(selectinload(Question.answer_options))
+    return query
+
+
+def question_out(question: Question, embed: List[QuestionEmbed]):
+    # незагруженные связи не трогаем: ленивая загрузка в AsyncSession падает
+    data = QuestionSchema.model_validate(question).model_dump()
+    if QuestionEmbed.answer_options in embed:
+        data["answer_options"] = question.answer_options
+    if QuestionEmbed.category in embed:
+        data["category"] = question.category
+    return data
+
+
+@question_router.get("/", response_model=List[QuestionDetailSchema], response_model_exclude_none=True)
+async def list_questions(
+    request: Request,
     category: Optional[int] = Query(None),
     difficulty: Optional[str] = Query(None),
     limit: Optional[int] = Query(20),
-    db: Session = Depends(get_db)
+    embed: List[QuestionEmbed] = Query([]),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = db.query(Question)
+    query = question_select(embed)
 
     if category is not None:
-        query = query.filter(Question.category_id == category)
+        query = query.where(Question.category_id == category)
     if difficulty is not None:
-        query = query.filter(Question.difficulty == difficulty)
+        query = query.where(Question.difficulty == difficulty)
+
+    async def build():
+        questions = (await db.scalars(query.limit(limit))).all()
+        return [question_out(question, embed) for question in questions]
 
-    questions = query.limit(limit).all()
-    return questions
+    # embed тянет и связанные таблицы: их изменения тоже сбрасывают ответ
+    tags = ['questions'] + [EMBED_TAGS[item] for item in embed]
+    return await response_cache.response(request, db, 'questions.list', tags, build,
+                                         List[QuestionDetailSchema], exclude_none=True)
 
 
-@question_router.get("/{question_id}", response_model=QuestionSchema)
-def get_question(question_id: int, db: Session = Depends(get_db)):
-    question = db.query(Question).filter(Question.id == question_id).first()
+@question_router.post("/import")
+async def import_question_bank(
+    file: UploadFile = File(...),
+    dry_run: bool = Query(False),
+    db: AsyncSession = Depends(get_db)
+):
+    data = await file.read(QUESTION_IMPORT_MAX_BYTES + 1)
+    if len(data) > QUESTION_IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="File is too large")
+
+    try:
+        questions = validate(parse(data, file.filename or ''))
+    except QuestionImportError as e:
+        raise HTTPException(status_code=422, detail={"errors": e.errors, "total": e.total})
+    if dry_run:
+        return {"questions": len(questions), "dry_run": True}
+
+    # все пачки в одной транзакции: при ошибке не остаётся половины банка
+    try:
+        report = await import_questions(db, questions)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    await response_cache.invalidate('questions', 'answer_options', 'categories')
+    return report
+
+
+@question_router.get("/bank")
+async def question_bank_snapshot(request: Request, since: Optional[str] = Query(None)):
+    """Весь банк вопросов одним ответом; с since - только изменения с этой версии."""
+    snapshot = await question_bank.snapshot()
+    headers = {"X-Bank-Version": snapshot.version, "Vary": "Accept-Encoding"}
+
+    if since is not None:
+        delta = question_bank.delta(snapshot, since)
+        if delta is not None:
+            return JSONResponse(delta, headers=headers)
+        # версия слишком старая или с другого воркера до перезапуска - отдаём целиком
+
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(snapshot.gzipped, media_type="application/json", headers=headers)
+    return Response(snapshot.body, media_type="application/json", headers=headers)
+
+
+@question_router.get("/{question_id}", response_model=QuestionDetailSchema, response_model_exclude_none=True)
+async def get_question(
+    question_id: int,
+    embed: List[QuestionEmbed] = Query([]),
+    db: AsyncSession = Depends(get_read_db)
+):
+    question = await db.scalar(question_select(embed).where(Question.id == question_id))
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
-    return question
+    return question_out(question, embed)
 
 
 @question_router.post("/{question_id}/favorite")
-def favorite_question(question_id: int, user_id: int = 1, db: Session = Depends(get_db)):
-    question = db.query(Question).filter(Question.id == question_id).first()
+async def favorite_question(question_id: int, user_id: int = 1, db: AsyncSession = Depends(get_db)):
+    question = await db.scalar(select(Question).where(Question.id == question_id))
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
 
@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+
+from pdd_app.config import UVICORN_WORKERS
+from pdd_app.db.database import async_engine, engine
+from pdd_app.db.pool import pool_status
+from pdd_app.db.question_bank import question_bank
+from pdd_app.db.replicas import replicas
+from pdd_app.db.response_cache import response_cache
+from pdd_app.db.views import view_counter
+
+system_router = APIRouter(prefix='/system', tags=['System'])
+
+
+@system_router.get('/db/pool')
+async def db_pool():
+    pools = {"async": pool_status(async_engine), "sync": pool_status(engine)}
+    for i, replica in enumerate(replicas.replicas):
+        pools[f"replica_{i}"] = pool_status(replica.engine)
+    per_worker = sum(pool.get("capacity", 0) for pool in pools.values())
+    return {
+        **pools,
+        "workers": UVICORN_WORKERS,
+        # сравнивать с max_connections Postgres (или default_pool_size PgBouncer)
+        "max_connections_per_worker": per_worker,
+        "max_connections_total": per_worker * UVICORN_WORKERS,
+    }
+
+
+@system_router.get('/db/replicas')
+async def db_replicas():
+    return replicas.status()
+
+
+@system_router.get('/question_bank')
+async def question_bank_status():
+    return question_bank.status()
+
+
+@system_router.get('/views')
+async def views_status():
+    return await view_counter.stats()
+
+
+@system_router.get('/cache')
+async def cache_status():
+    return response_cache.stats()
@@ -0,0 +1,140 @@
+import io
+from fastapi import HTTPException, Request
+from PIL import Image, UnidentifiedImageError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from pdd_app.config import PREDICT_MAX_UPLOAD_BYTES, PREDICT_MAX_IMAGE_PIXELS
+
+# после скольких байт пробуем прочитать заголовок изображения (EXIF бывает до 64 КБ)
+PROBE_THRESHOLDS = (16 * 1024, 64 * 1024, 256 * 1024)
+# запас на boundary и заголовки частей multipart
+MULTIPART_OVERHEAD = 64 * 1024
+
+IMAGE_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+def check_image_size(width: int, height: int, max_pixels: int = PREDICT_MAX_IMAGE_PIXELS):
+    if width * height > max_pixels:
+        raise HTTPException(status_code=413,
+                            detail=f'Слишком большое изображение {width}x{height} '
+                                   f'(максимум {max_pixels} пикселей)')
+
+
+class _ImagePartReader:
+    """Собирает из multipart только поле field и проверяет размер на лету."""
+
+    def __init__(self, field: str, max_bytes: int):
+        self.field = field.encode()
+        self.max_bytes = max_bytes
+        self.data = bytearray()
+        self.done = False
+        self.checked = False
+
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._disposition = b''
+        self._active = False
+        self._probe_at = 0
+
+    @property
+    def callbacks(self):
+        return {
+            'on_part_begin': self._on_part_begin,
+            'on_header_field': lambda data, start, end: self._header_field.extend(data[start:end]),
+            'on_header_value': lambda data, start, end: self._header_value.extend(data[start:end]),
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': self._on_headers_finished,
+            'on_part_data': self._on_part_data,
+            'on_part_end': self._on_part_end,
+        }
+
+    def _on_part_begin(self):
+        self._disposition = b''
+
+    def _on_header_end(self):
+        if bytes(self._header_field).lower() == b'content-disposition':
+            self._disposition = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        self._active = not self.done and options.get(b'name') == self.field
+
+    def _on_part_data(self, data, start, end):
+        if not self._active:
+            return
+        self.data.extend(data[start:end])
+        if len(self.data) > self.max_bytes:
+            raise HTTPException(status_code=413,
+                                detail=f'Файл больше {self.max_bytes // (1024 * 1024)} МБ')
+        if not self.checked and self._probe_at < len(PROBE_THRESHOLDS) \
+                and len(self.data) >= PROBE_THRESHOLDS[self._probe_at]:
+            self._probe_at += 1
+            self.probe()
+
+    def _on_part_end(self):
+        if self._active:
+            self._active = False
+            self.done = True
+            if not self.checked:
+                self.probe()
+
+    def probe(self):
+        # Image.open читает только заголовок, пиксели не декодируются
+        try:
+            with Image.open(io.BytesIO(self.data)) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            # больше 2 * Image.MAX_IMAGE_PIXELS: PIL отказывается открывать сам, размер не узнать
+            self.checked = True
+            raise HTTPException(status_code=413,
+                                detail=f'Слишком большое изображение '
+                                       f'(максимум {PREDICT_MAX_IMAGE_PIXELS} пикселей)')
+        except (UnidentifiedImageError, OSError, SyntaxError):
+            return
+        self.checked = True
+        check_image_size(width, height)
+
+
+async def read_image_upload(request: Request, field: str = 'file',
+                            max_bytes: int = PREDICT_MAX_UPLOAD_BYTES) -> bytearray:
+    """Читает multipart-тело кусками и держит в памяти не больше max_bytes.
+
+    Большие файлы и изображения с огромными размерами отклоняются
+    до того, как тело загружено целиком.
+    """
+    content_type, options = parse_options_header(request.headers.get('content-type', ''))
+    if content_type != b'multipart/form-data' or b'boundary' not in options:
+        raise HTTPException(status_code=400, detail='Ожидается multipart/form-data')
+
+    length = request.headers.get('content-length')
+    if length and length.isdigit() and int(length) > max_bytes + MULTIPART_OVERHEAD:
+        raise HTTPException(status_code=413,
+                            detail=f'Файл больше {max_bytes // (1024 * 1024)} МБ')
+
+    reader = _ImagePartReader(field, max_bytes)
+    parser = MultipartParser(options[b'boundary'], reader.callbacks)
+    async for chunk in request.stream():
+        parser.write(chunk)
+        if reader.done:
+            break
+    if not reader.done:
+        parser.finalize()
+
+    if not reader.data:
+        raise HTTPException(status_code=400, detail='Изображение не получено')
+    return reader.data
@@ -1,33 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
-from pdd_app.db.models import Video, Comment, User
-from pdd_app.db.schema import VideoSchema, CommentSchema
-from pdd_app.db.database import get_db
+from pdd_app.db.models import Video, Comment, Like, User
+from pdd_app.db import counters
+from pdd_app.db.views import view_counter
+from pdd_app.db.schema import VideoSchema, CommentCreateSchema
+from pdd_app.db.database import get_db, get_read_db
+from pdd_app.db.pagination import Page, PageParams, paginate
+from pdd_app.db.response_cache import response_cache
 
 video_router = APIRouter(prefix="/videos", tags=["Videos"])
 
 
-@video_router.get("/", response_model=List[VideoSchema])
-def list_videos(db: Session = Depends(get_db)):
-    videos = db.query(Video).all()
-    return videos
+@video_router.get("/", response_model=Page[VideoSchema])
+async def list_videos(request: Request, page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
+    # счётчики просмотров и лайков не меняют версию videos: в списке они отстают не больше чем на CACHE_TTL
+    return await response_cache.response(
+        request, db, 'videos.list', ['videos'],
+        lambda: paginate(db, select(Video), Video.id, page), Page[VideoSchema])
 
 
 @video_router.get("/{video_id}", response_model=VideoSchema)
-def video_detail(video_id: int, db: Session = Depends(get_db)):
-    video = db.query(Video).filter(Video.id == video_id).first()
+async def video_detail(video_id: int, db: AsyncSession = Depends(get_read_db)):
+    video = await db.scalar(select(Video).where(Video.id == video_id))
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
+    # просмотр уходит в буфер, views_count в базе догонит его при следующем сбросе;
+    # add не бросает: при недоступном буфере видео всё равно отдаётся
+    await view_counter.add(video_id)
     return video
 
 
 @video_router.post("/{video_id}/comment", response_model=dict)
-def add_comment(video_id: int, comment: CommentSchema, user_id: int = 1, db: Session = Depends(get_db)):
-    video = db.query(Video).filter(Video.id == video_id).first()
-    if not video:
+async def add_comment(video_id: int, comment: CommentCreateSchema, user_id: int = 1, db: AsyncSession = Depends(get_db)):
+    total_comments = await counters.bump(db, Video, video_id, 'comments_count')
+    if total_comments is None:
         raise HTTPException(status_code=404, detail="Video not found")
 
     new_comment = Comment(
@@ -37,19 +46,17 @@ def add_comment(video_id: int, comment: CommentSchema, user_id: int = 1, db: Ses
         created_at=datetime.utcnow()
     )
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
-    return {"message": "Comment added"}
+    await db.commit()
+    return {"message": "Comment added", "total_comments": total_comments}
 
 
 @video_router.post("/{video_id}/like", response_model=dict)
-def like_video(video_id: int, user_id: int = 1, db: Session = Depends(get_db)):
-    video = db.query(Video).filter(Video.id == video_id).first()
-    if not video:
+async def like_video(video_id: int, user_id: int = 1, db: AsyncSession = Depends(get_db)):
+    # счётчик растёт в базе одним UPDATE ... RETURNING: он же проверяет, что видео есть
+    total_likes = await counters.bump(db, Video, video_id, 'likes_count')
+    if total_likes is None:
         raise HTTPException(status_code=404, detail="Video not found")
 
-    video.likes_count = video.likes_count + 1 if video.likes_count else 1
-    db.add(video)
-    db.commit()
-    db.refresh(video)
-    return {"message": "Video liked", "total_likes": video.likes_count}
+    db.add(Like(video_id=video_id, user_id=user_id))
+    await db.commit()
+    return {"message": "Video liked", "total_likes": total_likes}
@@ -0,0 +1,125 @@
+"""Проверка через EXPLAIN, что запросы роутеров идут по индексам.
+
+    alembic upgrade head
+    python -m pdd_app.db.check_indexes
+
+На маленькой базе планировщик и так выберет Seq Scan, поэтому проверка
+выключает enable_seqscan: если подходящего индекса нет, Seq Scan останется
+в плане. Выход с кодом 1, если хоть один запрос без индекса.
+
+В списке только запросы, которые выполняют обработчики pdd_app/api; каждый
+подписан обработчиками. Где у роутера есть функция, строящая запрос
+(question_select, page_query), запрос собирается ею же. Выгрузки pdd_app/api/exports
+читают таблицы целиком и не проверяются.
+"""
+import json
+import sys
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.orm import joinedload, with_parent
+
+from pdd_app.api.questions import question_select
+from pdd_app.db.database import engine
+from pdd_app.db.models import (AnswerOption, Category, Comment, Exam, Like, PddClass, Question,
+                               QuestionDifficulty, Refresh, User, Video)
+from pdd_app.db.pagination import PageParams, encode_cursor, page_query
+
+INDEX_NODES = {'Index Scan', 'Index Only Scan', 'Bitmap Index Scan'}
+
+# вторая страница: WHERE id > cursor ORDER BY id LIMIT n+1, как в paginate
+PAGE = PageParams(cursor=encode_cursor(1), limit=20)
+
+
+def delete_loads(handlers: str, model):
+    """SELECT, которыми session.delete(obj) в handlers подгружает коллекции obj.
+
+    Без cascade ORM обнуляет внешние ключи детей, с delete-orphan удаляет их,
+    для secondary - строки таблицы связи; в любом случае сначала читает коллекцию
+    тем же условием, что и ленивая загрузка (with_parent).
+    """
+    parent = model(id=1)
+    return [(f'{handlers} -> {model.__name__}.{rel.key}',
+             select(rel.mapper.class_).where(with_parent(parent, getattr(model, rel.key))))
+            for rel in inspect(model).relationships if rel.uselist]
+
+
+# (обработчики, запрос)
+QUERIES = [
+    ('category.list_category', page_query(select(Category), Category.id, PAGE)),
+    ('category.detail_category, update_category, delete_category', select(Category).where(Category.id == 1)),
+    *delete_loads('category.delete_category', Category),
+    ('exam.exam_list', page_query(select(Exam), Exam.id, PAGE)),
+    ('exam.product_detail, exam_update, exam_delete', select(Exam).where(Exam.id == 1)),
+    *delete_loads('exam.exam_delete', Exam),
+    ('questions.list_questions category',
+     question_select([]).where(Question.category_id == 1).limit(20)),
+    ('questions.list_questions difficulty',
+     question_select([]).where(Question.difficulty == QuestionDifficulty.easy).limit(20)),
+    ('questions.list_questions category+difficulty',
+     question_select([]).where(Question.category_id == 1, Question.difficulty == QuestionDifficulty.easy)
+     .limit(20)),
+    ('questions.get_question, favorite_question', question_select([]).where(Question.id == 1)),
+    ('answeroptions.list_answers',
+     select(Question).options(joinedload(Question.answer_options)).where(Question.id == 1)),
+    ('answeroptions.create_answer', select(Question).where(Question.id == 1)),
+    ('answeroptions.update_answer, delete_answer', select(AnswerOption).where(AnswerOption.id == 1)),
+    ('auth.register, auth.login, users.create_user', select(User).where(User.username == 'user')),
+    ('auth.register email', select(User).where(User.email == 'user@example.com')),
+    ('auth.logout, auth.refresh', select(Refresh).where(Refresh.token == 'token')),
+    ('users.get_users', page_query(select(User), User.id, PAGE)),
+    ('users.get_user, update_user, delete_user', select(User).where(User.id == 1)),
+    *delete_loads('users.delete_user', User),
+    ('video.list_videos', page_query(select(Video), Video.id, PAGE)),
+    ('video.video_detail', select(Video).where(Video.id == 1)),
+    ('comments.detail_comment, update_comment, delete_comment', select(Comment).where(Comment.id == 1)),
+    *delete_loads('comments.delete_comment', Comment),
+    ('comments.list_likes', page_query(select(Like), Like.id, PAGE)),
+    ('comments.detail_like, delete_like', select(Like).where(Like.id == 1)),
+    # постоянный уровень кэша предсказаний (pdd_app/ml/cache.py PddClassStore.get)
+    ('pdd_pr.check_image, check_images',
+     select(PddClass.predicted_label, PddClass.confidence)
+     .where(PddClass.image_hash == 'hash', PddClass.model_version == 'version').limit(1)),
+]
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def explain(connection, statement):
+    sql = statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True})
+    result = connection.execute(text(f'EXPLAIN (FORMAT JSON) {sql}')).scalar()
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result[0]['Plan']
+
+
+def check(connection):
+    failures = []
+    for name, statement in QUERIES:
+        nodes = list(plan_nodes(explain(connection, statement)))
+        seq_scans = [node.get('Relation Name') for node in nodes if node['Node Type'] == 'Seq Scan']
+        used = sorted({node.get('Index Name') for node in nodes if node['Node Type'] in INDEX_NODES})
+        ok = not seq_scans and bool(used)
+        print(f'{"OK " if ok else "FAIL"} {name:<62} '
+              + (', '.join(used) if ok else f'Seq Scan on {", ".join(filter(None, seq_scans))}'))
+        if not ok:
+            failures.append(name)
+    return failures
+
+
+def main():
+    with engine.connect() as connection:
+        connection.execute(text('SET enable_seqscan = off'))
+        failures = check(connection)
+        connection.rollback()
+    if failures:
+        print(f'\nбез индекса: {len(failures)} из {len(QUERIES)}')
+        sys.exit(1)
+    print(f'\nвсе {len(QUERIES)} запросов идут по индексам')
+
+
+if __name__ == '__main__':
+    main()
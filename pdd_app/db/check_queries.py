@@ -0,0 +1,93 @@
+"""Проверка, что число SQL-запросов роутов вопросов не растёт с размером страницы.
+
+    python -m pdd_app.db.check_queries
+
+Каждый запрос роута выполняется с разным limit, запросы к базе считаются по
+before_cursor_execute. Выход с кодом 1, если хоть где-то число запросов
+зависит от limit (N+1 при подгрузке связей) или в базе нет вопросов. Та же
+проверка на засеянной aiosqlite-базе - tests/test_question_queries.py.
+"""
+import asyncio
+import sys
+
+from sqlalchemy import event, select
+
+from pdd_app.api.questions import QuestionEmbed, question_out, question_select
+from pdd_app.db.database import AsyncSessionLocal, async_engine
+from pdd_app.db.models import Question
+from pdd_app.db.schema import QuestionDetailSchema
+
+LIMITS = (1, 10, 100)
+
+# (роут, embed) - те же загрузчики, что в pdd_app/api/questions.py
+CASES = [
+    ('questions.list_questions', []),
+    ('questions.list_questions embed=answer_options', [QuestionEmbed.answer_options]),
+    ('questions.list_questions embed=category', [QuestionEmbed.category]),
+    ('questions.list_questions embed=answer_options,category',
+     [QuestionEmbed.answer_options, QuestionEmbed.category]),
+]
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+
+async def count_queries(embed, limit: int):
+    async with AsyncSessionLocal() as db:
+        with QueryCounter(async_engine.sync_engine) as counter:
+            questions = (await db.scalars(question_select(embed).limit(limit))).all()
+            # сериализация как в роуте: ленивая подгрузка связи здесь упала бы или добавила запросы
+            [QuestionDetailSchema.model_validate(question_out(question, embed)) for question in questions]
+        return counter.count, len(questions)
+
+
+async def check():
+    async with AsyncSessionLocal() as db:
+        any_question = await db.scalar(select(Question.id).limit(1))
+    if any_question is None:
+        return None
+
+    failures = []
+    for name, embed in CASES:
+        counts = [await count_queries(embed, limit) for limit in LIMITS]
+        ok = len({queries for queries, _ in counts}) == 1
+        print(f'{"OK " if ok else "FAIL"} {name:<56} '
+              + ', '.join(f'{rows} строк: {queries}' for queries, rows in counts))
+        if not ok:
+            failures.append(name)
+    return failures
+
+
+def main():
+    async def run():
+        try:
+            return await check()
+        finally:
+            await async_engine.dispose()
+
+    failures = asyncio.run(run())
+    if failures is None:
+        print('в базе нет вопросов: проверка не выполнена')
+        sys.exit(1)
+    if failures:
+        print(f'\nчисло запросов растёт с limit: {len(failures)} из {len(CASES)}')
+        sys.exit(1)
+    print(f'\nвсе {len(CASES)} вариантов укладываются в постоянное число запросов')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Денормализованные счётчики лайков и комментариев.
+
+Счётчики меняются в той же транзакции, что и строка Like/Comment, одним
+UPDATE ... SET likes_count = likes_count + 1: без чтения в Python, поэтому
+параллельные лайки не теряются. Расхождения (удаление в обход роутов, sqladmin,
+ручные правки) чинит reconcile:
+
+    python -m pdd_app.db.counters              # один проход
+    python -m pdd_app.db.counters --every 600  # в цикле, раз в 10 минут
+"""
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pdd_app.db.models import Comment, Like, Question, Video
+
+# (таблица, счётчик, таблица-источник, её внешний ключ)
+COUNTERS = [
+    (Video, 'likes_count', Like, Like.video_id),
+    (Video, 'comments_count', Comment, Comment.video_id),
+    (Question, 'likes_count', Like, Like.question_id),
+    (Question, 'comments_count', Comment, Comment.question_id),
+    (Comment, 'likes_count', Like, Like.comment_id),
+]
+
+
+async def bump(db: AsyncSession, model, id: int, column: str, delta: int = 1) -> Optional[int]:
+    """Атомарно прибавляет delta к счётчику; новое значение или None, если строки нет.
+
+    UPDATE идёт по таблице, а не по ORM-модели: объекты в сессии не синхронизируются,
+    и слушатели снимка банка вопросов не считают это изменением содержимого.
+    """
+    table = model.__table__
+    counter = table.c[column]
+    query = update(table).where(table.c.id == id)
+    if delta < 0:
+        # ниже нуля не уходим; дрейф исправит reconcile
+        query = query.where(counter >= -delta)
+    # только счётчик: версию таблицы для ETag не поднимаем (pdd_app.db.table_versions)
+    query = query.values({counter: counter + delta}).returning(counter).execution_options(table_versions=False)
+    return await db.scalar(query)
+
+
+def _like_targets(like: Like):
+    return [(model, id) for model, id in ((Video, like.video_id), (Question, like.question_id),
+                                          (Comment, like.comment_id)) if id is not None]
+
+
+def _comment_targets(comment: Comment):
+    return [(model, id) for model, id in ((Video, comment.video_id), (Question, comment.question_id))
+            if id is not None]
+
+
+async def like_added(db: AsyncSession, like: Like, delta: int = 1):
+    for model, id in _like_targets(like):
+        await bump(db, model, id, 'likes_count', delta)
+
+
+async def like_removed(db: AsyncSession, like: Like):
+    await like_added(db, like, delta=-1)
+
+
+async def comment_added(db: AsyncSession, comment: Comment, delta: int = 1):
+    for model, id in _comment_targets(comment):
+        await bump(db, model, id, 'comments_count', delta)
+
+
+async def comment_removed(db: AsyncSession, comment: Comment):
+    await comment_added(db, comment, delta=-1)
+
+
+# ================= RECONCILE =================
+async def reconcile(db: AsyncSession):
+    """Пересчитывает счётчики по фактическим строкам; обновляет только разошедшиеся.
+
+    Возвращает {"videos.likes_count": число исправленных строк, ...}; commit делает вызывающий.
+    """
+    repaired = {}
+    for model, column, source, foreign_key in COUNTERS:
+        table = model.__table__
+        actual = (select(func.count()).select_from(source.__table__)
+                  .where(foreign_key == table.c.id).scalar_subquery())
+        result = await db.execute(
+            update(table).where(table.c[column].is_distinct_from(actual)).values({column: actual})
+            .execution_options(table_versions=False)
+        )
+        repaired[f'{table.name}.{column}'] = result.rowcount
+    return repaired
+
+
+if __name__ == '__main__':
+    import argparse
+    import asyncio
+    import json
+    import logging
+
+    from pdd_app.db.database import AsyncSessionLocal, async_engine
+
+    parser = argparse.ArgumentParser(prog='python -m pdd_app.db.counters')
+    parser.add_argument('--every', type=float, help='повторять раз в N секунд')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        try:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    repaired = await reconcile(db)
+                    await db.commit()
+                logging.info('counters reconciled: %s', json.dumps(repaired))
+                if args.every is None:
+                    break
+                await asyncio.sleep(args.every)
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(main())
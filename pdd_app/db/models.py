@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
-from sqlalchemy import String, Integer, Text, Boolean, DateTime, ForeignKey, Enum, Table, Column, Float
+from sqlalchemy import String, Integer, BigInteger, Text, Boolean, DateTime, ForeignKey, Enum, Table, Column, Float, Index, text
 from datetime import datetime
 from enum import Enum as PyEnum
 from typing import List, Optional
@@ -44,9 +44,9 @@ class Refresh(Base):
     __tablename__ = 'refresh_token'
 
     id: Mapped[int] = mapped_column(Integer, autoincrement=True, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey('user_profile.id'))
+    user_id: Mapped[int] = mapped_column(ForeignKey('user_profile.id'), index=True)
     user: Mapped[User] = relationship(User, back_populates='user_token')
-    token: Mapped[str] = mapped_column(String, nullable=False)
+    token: Mapped[str] = mapped_column(String, nullable=False, index=True)
     created_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     def __str__(self):
@@ -57,7 +57,7 @@ question_exam = Table(
     "question_exam",
     Base.metadata,
     Column("question_id", ForeignKey("questions.id"), primary_key=True),
-    Column("exam_id", ForeignKey("exams.id"), primary_key=True)
+    Column("exam_id", ForeignKey("exams.id"), primary_key=True, index=True)
 )
 
 
@@ -72,19 +72,25 @@ class Category(Base):
 
 class Question(Base):
     __tablename__ = "questions"
+    __table_args__ = (
+        Index("ix_questions_category_id_difficulty", "category_id", "difficulty"),
+        Index("ix_questions_difficulty", "difficulty"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     text: Mapped[str] = mapped_column(Text, nullable=False)
     explanation: Mapped[str] = mapped_column(Text, nullable=False)
     difficulty: Mapped[QuestionDifficulty] = mapped_column(Enum(QuestionDifficulty), nullable=False)
     category_id: Mapped[int] = mapped_column(ForeignKey("categories.id"))
+    # счётчики ведёт pdd_app.db.counters атомарным UPDATE, расхождения чинит reconcile
+    likes_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    comments_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     category: Mapped["Category"] = relationship("Category", back_populates="questions")
     answer_options: Mapped[List["AnswerOption"]] = relationship("AnswerOption", back_populates="question")
     exams: Mapped[List["Exam"]] = relationship("Exam", secondary=question_exam, back_populates="questions")
     comments: Mapped[List["Comment"]] = relationship("Comment", back_populates="question")
     likes: Mapped[List["Like"]] = relationship("Like", back_populates="question")
-    pdd_classes: Mapped[List["PddClass"]] = relationship("PddClass", back_populates="question")
 
 
 class AnswerOption(Base):
@@ -93,13 +99,16 @@ class AnswerOption(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     text: Mapped[str] = mapped_column(Text, nullable=False)
     is_correct: Mapped[bool] = mapped_column(Boolean, default=False)
-    question_id: Mapped[int] = mapped_column(ForeignKey("questions.id"))
+    question_id: Mapped[int] = mapped_column(ForeignKey("questions.id"), index=True)
 
     question: Mapped["Question"] = relationship("Question", back_populates="answer_options")
 
 
 class Exam(Base):
     __tablename__ = "exams"
+    __table_args__ = (
+        Index("ix_exams_user_id_started_at", "user_id", "started_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("user_profile.id"))
@@ -120,6 +129,9 @@ class Video(Base):
     description: Mapped[str] = mapped_column(Text)
     url: Mapped[str] = mapped_column(String, nullable=False)
     views_count: Mapped[int] = mapped_column(Integer, default=0)
+    # счётчики ведёт pdd_app.db.counters атомарным UPDATE, расхождения чинит reconcile
+    likes_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    comments_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     comments: Mapped[List["Comment"]] = relationship("Comment", back_populates="video")
     likes: Mapped[List["Like"]] = relationship("Like", back_populates="video")
@@ -127,6 +139,13 @@ class Video(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("ix_comments_question_id_created_at", "question_id", "created_at",
+              postgresql_where=text("question_id IS NOT NULL")),
+        Index("ix_comments_video_id_created_at", "video_id", "created_at",
+              postgresql_where=text("video_id IS NOT NULL")),
+        Index("ix_comments_user_id", "user_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     text: Mapped[str] = mapped_column(Text, nullable=False)
@@ -134,6 +153,7 @@ class Comment(Base):
     user_id: Mapped[int] = mapped_column(ForeignKey("user_profile.id"))
     question_id: Mapped[Optional[int]] = mapped_column(ForeignKey("questions.id"), nullable=True)
     video_id: Mapped[Optional[int]] = mapped_column(ForeignKey("videos.id"), nullable=True)
+    likes_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     user: Mapped["User"] = relationship("User", back_populates="comments")
     question: Mapped[Optional["Question"]] = relationship("Question", back_populates="comments")
@@ -143,6 +163,12 @@ class Comment(Base):
 
 class Like(Base):
     __tablename__ = "likes"
+    __table_args__ = (
+        Index("ix_likes_user_id", "user_id"),
+        Index("ix_likes_question_id", "question_id", postgresql_where=text("question_id IS NOT NULL")),
+        Index("ix_likes_video_id", "video_id", postgresql_where=text("video_id IS NOT NULL")),
+        Index("ix_likes_comment_id", "comment_id", postgresql_where=text("comment_id IS NOT NULL")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("user_profile.id"))
@@ -164,4 +190,14 @@ class PddClass(Base):
     image_url: Mapped[str] = mapped_column(String, nullable=True)
     predicted_label: Mapped[str] = mapped_column(String, nullable=True)
     confidence: Mapped[float] = mapped_column(Float, nullable=True)
+    image_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
+    model_version: Mapped[Optional[str]] = mapped_column(String(16), nullable=True)
     created_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow(), autoincrement=True, nullable=True)
+
+
+class TableVersion(Base):
+    """Версия содержимого таблицы для ETag; растёт в той же транзакции, что и запись (pdd_app.db.table_versions)."""
+    __tablename__ = "table_versions"
+
+    table_name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
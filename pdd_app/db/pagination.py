@@ -0,0 +1,61 @@
+import base64
+import json
+from typing import Generic, List, Optional, TypeVar
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pdd_app.config import PAGE_SIZE, PAGE_SIZE_MAX
+
+T = TypeVar('T')
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+class PageParams:
+    def __init__(self, cursor: Optional[str] = Query(None, description='next_cursor предыдущей страницы'),
+                 limit: int = Query(PAGE_SIZE, ge=1, le=PAGE_SIZE_MAX)):
+        self.cursor = cursor
+        self.limit = limit
+
+
+def encode_cursor(key) -> str:
+    raw = json.dumps({"k": key}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return json.loads(raw)["k"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail='Некорректный cursor')
+
+
+def page_query(query: Select, key_column, page: PageParams) -> Select:
+    """WHERE key > last ORDER BY key LIMIT n+1 - запрос одной страницы."""
+    if page.cursor is not None:
+        last = decode_cursor(page.cursor)
+        if not isinstance(last, int):
+            raise HTTPException(status_code=400, detail='Некорректный cursor')
+        query = query.where(key_column > last)
+    return query.order_by(key_column).limit(page.limit + 1)
+
+
+async def paginate(db: AsyncSession, query: Select, key_column, page: PageParams):
+    """Keyset-пагинация по уникальной колонке (обычно id).
+
+    Стоимость страницы не зависит от её номера, в отличие от OFFSET.
+    """
+    rows = (await db.scalars(page_query(query, key_column, page))).all()
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor(getattr(rows[-1], key_column.key))
+    return {"items": rows, "next_cursor": next_cursor}
@@ -0,0 +1,129 @@
+import threading
+import time
+import uuid
+from collections import deque
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from pdd_app.config import (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+                            DB_POOL_PRE_PING, DB_NULL_POOL, DB_PGBOUNCER, DB_ECHO,
+                            DB_ADMIN_POOL_SIZE, DB_APPLICATION_NAME)
+
+
+class PoolStats:
+    """Счётчики выдачи соединений: сколько ждали свободное соединение и сколько раз не дождались."""
+
+    def __init__(self, window: int = 1000):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, wait_ms: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            self._recent.append(wait_ms)
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            checkouts = self.checkouts
+            return {
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total_ms / checkouts, 3) if checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 3),
+                "wait_p99_ms": round(recent[int(0.99 * (len(recent) - 1))], 3) if recent else 0.0,
+            }
+
+
+class _TimedPoolMixin:
+    # _do_get блокируется, пока в пуле нет свободного соединения: это и есть время ожидания
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(0.0, timed_out=True)
+            raise
+        self.stats.record((time.perf_counter() - started) * 1000)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(is_async: bool):
+    options = {
+        "echo": DB_ECHO,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if DB_NULL_POOL:
+        # соединения держит PgBouncer, приложение открывает их на каждый checkout
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+            # синхронный движок нужен только sqladmin
+            pool_size=DB_POOL_SIZE if is_async else DB_ADMIN_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW if is_async else 0,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+
+    if is_async:
+        connect_args = {"server_settings": {"application_name": DB_APPLICATION_NAME}}
+        if DB_PGBOUNCER:
+            # в transaction mode соседний запрос может попасть на другое серверное соединение,
+            # поэтому кэш prepared statements asyncpg выключаем, а имена делаем уникальными
+            connect_args.update(
+                statement_cache_size=0,
+                prepared_statement_cache_size=0,
+                prepared_statement_name_func=lambda: f'__asyncpg_{uuid.uuid4()}__',
+            )
+    else:
+        connect_args = {"application_name": DB_APPLICATION_NAME}
+    options["connect_args"] = connect_args
+    return options
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        size = pool.size()
+        status.update(
+            size=size,
+            max_overflow=pool._max_overflow,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            # overflow() < 0, пока пул ещё не открыл все pool_size соединений
+            overflow=max(0, pool.overflow()),
+            capacity=size + max(0, pool._max_overflow),
+            timeout_s=pool.timeout(),
+        )
+    if isinstance(pool, _TimedPoolMixin):
+        status.update(pool.stats.snapshot())
+    return status
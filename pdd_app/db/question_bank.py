@@ -0,0 +1,239 @@
+"""Версионированный снимок банка вопросов для клиентов.
+
+Снимок - все категории и вопросы с вариантами ответа, собранные одним
+проходом по базе и заранее сжатые gzip. Версия - хеш содержимого, поэтому
+у всех воркеров с одинаковыми данными она совпадает. Для последних
+QUESTION_BANK_HISTORY версий хранятся хеши строк: клиенту со старой версией
+отдаётся дельта (новые, изменённые и удалённые id), а не весь банк.
+
+Снимок пересобирается при следующем запросе после commit, который трогал
+questions, answer_options или categories в этом процессе. Раз в
+QUESTION_BANK_MAX_AGE секунд сверяются версии этих таблиц (table_versions):
+изменения из других воркеров и sqladmin пересобирают снимок, а если версии
+те же, снимок просто продлевается. Сериализация, gzip и хеши идут в потоке,
+event loop на время сборки не блокируется.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from pdd_app.config import QUESTION_BANK_HISTORY, QUESTION_BANK_MAX_AGE
+from pdd_app.db.database import AsyncSessionLocal
+from pdd_app.db.models import AnswerOption, Category, Question
+from pdd_app.db.table_versions import read_versions
+
+logger = logging.getLogger(__name__)
+
+BANK_MODELS = (Question, AnswerOption, Category)
+BANK_TABLES = [model.__tablename__ for model in BANK_MODELS]
+
+
+def _dumps(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def _row_hash(row: dict) -> bytes:
+    return hashlib.blake2b(_dumps(row), digest_size=8).digest()
+
+
+class Snapshot:
+    def __init__(self, categories: Dict[int, dict], questions: Dict[int, dict]):
+        self.categories = categories
+        self.questions = questions
+        self.category_hashes = {id: _row_hash(row) for id, row in categories.items()}
+        self.question_hashes = {id: _row_hash(row) for id, row in questions.items()}
+
+        digest = hashlib.blake2b(digest_size=8)
+        for hashes in (self.category_hashes, self.question_hashes):
+            for id in sorted(hashes):
+                digest.update(id.to_bytes(8, 'big') + hashes[id])
+        self.version = digest.hexdigest()
+        self.built_at = time.time()
+        # версии таблиц на момент чтения; None - не удалось прочитать
+        self.table_versions: Optional[list] = None
+
+        self.body = _dumps({
+            "version": self.version,
+            "categories": list(categories.values()),
+            "questions": list(questions.values()),
+        })
+        self.gzipped = gzip.compress(self.body, compresslevel=6)
+
+
+def _diff(old: Dict[int, bytes], new: Dict[int, bytes]):
+    inserted = [id for id in new if id not in old]
+    updated = [id for id in new if id in old and old[id] != new[id]]
+    deleted = [id for id in old if id not in new]
+    return inserted, updated, deleted
+
+
+class QuestionBank:
+    def __init__(self, history: int = 10, max_age: float = 60.0):
+        self.history = history
+        self.max_age = max_age
+        self.builds = 0
+        self.extended = 0
+        self.stale = True
+        self.current: Optional[Snapshot] = None
+        # версия -> хеши строк (без самих данных) для расчёта дельт
+        self._versions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self.stale = True
+
+    def _expired(self) -> bool:
+        return (self.current is None or self.stale
+                or time.time() - self.current.built_at >= self.max_age)
+
+    async def _table_versions(self, db) -> Optional[list]:
+        try:
+            return await read_versions(db, BANK_TABLES)
+        except Exception:
+            logger.exception('question bank: table versions are unavailable')
+            # в Postgres ошибка обрывает транзакцию, а снимок читается в той же сессии
+            await db.rollback()
+            return None
+
+    async def _load(self) -> Snapshot:
+        # чтение с primary: после своей же записи реплика может отдать старые данные
+        async with AsyncSessionLocal() as db:
+            # версии до данных: запись между ними только лишний раз пересоберёт снимок
+            versions = await self._table_versions(db)
+            categories = {
+                id: {"id": id, "category_name": name}
+                for id, name in (await db.execute(
+                    select(Category.id, Category.category_name).order_by(Category.id))).all()
+            }
+            questions = {
+                id: {"id": id, "text": text, "explanation": explanation,
+                     "difficulty": difficulty.value, "category_id": category_id, "answer_options": []}
+                for id, text, explanation, difficulty, category_id in (await db.execute(
+                    select(Question.id, Question.text, Question.explanation,
+                           Question.difficulty, Question.category_id).order_by(Question.id))).all()
+            }
+            options = await db.execute(
+                select(AnswerOption.id, AnswerOption.text, AnswerOption.is_correct, AnswerOption.question_id)
+                .order_by(AnswerOption.id))
+            for id, text, is_correct, question_id in options.all():
+                if question_id in questions:
+                    questions[question_id]["answer_options"].append(
+                        {"id": id, "text": text, "is_correct": bool(is_correct)})
+        # JSON, gzip и хеши всего банка - сотни миллисекунд CPU, не для event loop
+        snapshot = await asyncio.to_thread(Snapshot, categories, questions)
+        snapshot.table_versions = versions
+        return snapshot
+
+    async def _unchanged(self) -> bool:
+        if self.current.table_versions is None:
+            return False
+        async with AsyncSessionLocal() as db:
+            versions = await self._table_versions(db)
+        return versions == self.current.table_versions
+
+    async def snapshot(self) -> Snapshot:
+        if not self._expired():
+            return self.current
+        async with self._lock:
+            if not self._expired():
+                return self.current
+            # флаг снимается до чтения: commit во время сборки снова пометит снимок устаревшим
+            stale, self.stale = self.stale, False
+            if not stale and self.current is not None and await self._unchanged():
+                # истёк только max_age, а таблицы банка никто не менял
+                self.current.built_at = time.time()
+                self.extended += 1
+                return self.current
+            snapshot = await self._load()
+            if self.current is not None and snapshot.version == self.current.version:
+                self.current.built_at = snapshot.built_at
+                self.current.table_versions = snapshot.table_versions
+                return self.current
+            self.current = snapshot
+            self.builds += 1
+            self._versions[snapshot.version] = (snapshot.category_hashes, snapshot.question_hashes)
+            self._versions.move_to_end(snapshot.version)
+            while len(self._versions) > self.history:
+                self._versions.popitem(last=False)
+            return snapshot
+
+    def delta(self, snapshot: Snapshot, since: str) -> Optional[dict]:
+        """Дельта от версии since до snapshot; None, если since неизвестна (нужен полный снимок)."""
+        old = self._versions.get(since)
+        if old is None:
+            return None
+        old_categories, old_questions = old
+        categories = _diff(old_categories, snapshot.category_hashes)
+        questions = _diff(old_questions, snapshot.question_hashes)
+        return {
+            "version": snapshot.version,
+            "since": since,
+            "categories": {
+                "inserted": [snapshot.categories[id] for id in categories[0]],
+                "updated": [snapshot.categories[id] for id in categories[1]],
+                "deleted": categories[2],
+            },
+            "questions": {
+                "inserted": [snapshot.questions[id] for id in questions[0]],
+                "updated": [snapshot.questions[id] for id in questions[1]],
+                "deleted": questions[2],
+            },
+        }
+
+    def status(self):
+        current = self.current
+        return {
+            "version": current.version if current else None,
+            "stale": self.stale,
+            "built_ago_s": round(time.time() - current.built_at, 1) if current else None,
+            "builds": self.builds,
+            "extended": self.extended,
+            "categories": len(current.categories) if current else 0,
+            "questions": len(current.questions) if current else 0,
+            "bytes": len(current.body) if current else 0,
+            "gzip_bytes": len(current.gzipped) if current else 0,
+            "versions": list(self._versions),
+        }
+
+
+question_bank = QuestionBank(history=QUESTION_BANK_HISTORY, max_age=QUESTION_BANK_MAX_AGE)
+
+
+# ================= INVALIDATION =================
+# слушатели на классе Session видят и sync-сессии sqladmin, и AsyncSession (через sync_session)
+def _touches_bank(objects) -> bool:
+    return any(isinstance(obj, BANK_MODELS) for obj in objects)
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_flush(session, flush_context):
+    if _touches_bank(session.new) or _touches_bank(session.dirty) or _touches_bank(session.deleted):
+        session.info['question_bank_changed'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_bulk(orm_execute_state):
+    # insert()/update()/delete() по моделям банка идут мимо flush (например, импорт)
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in BANK_MODELS:
+            orm_execute_state.session.info['question_bank_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate(session):
+    if session.info.pop('question_bank_changed', False):
+        question_bank.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget(session):
+    session.info.pop('question_bank_changed', None)
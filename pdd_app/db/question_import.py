@@ -0,0 +1,177 @@
+"""Импорт банка вопросов из JSON или CSV одной транзакцией.
+
+    python -m pdd_app.db.question_import bank.json [--dry-run]
+
+JSON: список (или {"questions": [...]}) объектов
+    {"text", "explanation", "difficulty", "category", "answer_options": [{"text", "is_correct"}]}
+CSV: колонки text, explanation, difficulty, category, option_1..option_N и correct -
+номера правильных вариантов через ";" (с 1).
+"""
+import csv
+import io
+import json
+import time
+from typing import List
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pdd_app.config import QUESTION_IMPORT_BATCH_SIZE
+from pdd_app.db.models import AnswerOption, Category, Question
+from pdd_app.db.schema import QuestionImportSchema
+
+
+class QuestionImportError(ValueError):
+    """Файл не разобран или не прошёл проверку; errors - список ошибок по строкам."""
+
+    def __init__(self, errors: List[dict], total: int = 0):
+        super().__init__(f'{len(errors)} ошибок')
+        self.errors = errors
+        self.total = total
+
+
+def parse_json(data: bytes):
+    try:
+        payload = json.loads(data)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise QuestionImportError([{"row": None, "errors": [f'JSON не разобран: {e}']}])
+    if isinstance(payload, dict):
+        payload = payload.get('questions')
+    if not isinstance(payload, list):
+        raise QuestionImportError([{"row": None, "errors": ['ожидается список вопросов или {"questions": [...]}']}])
+    return payload
+
+
+def parse_csv(data: bytes):
+    try:
+        reader = csv.DictReader(io.StringIO(data.decode('utf-8-sig')))
+        rows = list(reader)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise QuestionImportError([{"row": None, "errors": [f'CSV не разобран: {e}']}])
+
+    option_columns = sorted((name for name in reader.fieldnames or [] if name.startswith('option_')),
+                            key=lambda name: int(name.split('_', 1)[1]) if name.split('_', 1)[1].isdigit() else 0)
+    records = []
+    for row in rows:
+        correct = {part.strip() for part in (row.get('correct') or '').split(';') if part.strip()}
+        options = []
+        for column in option_columns:
+            text = (row.get(column) or '').strip()
+            if text:
+                options.append({"text": text, "is_correct": column.split('_', 1)[1] in correct})
+        records.append({
+            "text": row.get('text'),
+            "explanation": row.get('explanation') or '',
+            "difficulty": row.get('difficulty'),
+            "category": row.get('category'),
+            "answer_options": options,
+        })
+    return records
+
+
+def parse(data: bytes, filename: str = ''):
+    if filename.lower().endswith('.csv'):
+        return parse_csv(data)
+    if filename.lower().endswith('.json') or data.lstrip()[:1] in (b'[', b'{'):
+        return parse_json(data)
+    return parse_csv(data)
+
+
+def validate(records) -> List[QuestionImportSchema]:
+    """Проверяет весь файл целиком и собирает ошибки по строкам (нумерация с 1)."""
+    questions, errors, seen = [], [], {}
+    for row, record in enumerate(records, start=1):
+        try:
+            question = QuestionImportSchema.model_validate(record)
+        except ValidationError as e:
+            errors.append({"row": row, "errors": [
+                f'{".".join(map(str, error["loc"])) or "row"}: {error["msg"]}' for error in e.errors()
+            ]})
+            continue
+        key = (question.category, question.text.strip())
+        if key in seen:
+            errors.append({"row": row, "errors": [f'дубликат строки {seen[key]}']})
+            continue
+        seen[key] = row
+        questions.append(question)
+    if errors:
+        raise QuestionImportError(errors, total=len(records))
+    return questions
+
+
+async def _category_ids(db: AsyncSession, names):
+    ids = dict((await db.execute(select(Category.category_name, Category.id)
+                                 .where(Category.category_name.in_(names)))).all())
+    missing = [name for name in names if name not in ids]
+    if missing:
+        created = await db.execute(
+            insert(Category).returning(Category.category_name, Category.id, sort_by_parameter_order=True),
+            [{"category_name": name} for name in missing],
+        )
+        ids.update(dict(created.all()))
+    return ids
+
+
+async def import_questions(db: AsyncSession, questions: List[QuestionImportSchema],
+                           batch_size: int = QUESTION_IMPORT_BATCH_SIZE):
+    """Пишет вопросы и варианты multi-row INSERT'ами пачками; commit делает вызывающий."""
+    started = time.perf_counter()
+    category_ids = await _category_ids(db, sorted({question.category for question in questions}))
+
+    options = 0
+    for start in range(0, len(questions), batch_size):
+        batch = questions[start:start + batch_size]
+        # RETURNING с sort_by_parameter_order: id приходят в порядке строк, варианты привязываем по нему
+        ids = (await db.scalars(
+            insert(Question).returning(Question.id, sort_by_parameter_order=True),
+            [{
+                "text": question.text,
+                "explanation": question.explanation,
+                "difficulty": question.difficulty,
+                "category_id": category_ids[question.category],
+            } for question in batch],
+        )).all()
+        rows = [{"question_id": question_id, "text": option.text, "is_correct": option.is_correct}
+                for question_id, question in zip(ids, batch) for option in question.answer_options]
+        await db.execute(insert(AnswerOption), rows)
+        options += len(rows)
+
+    return {
+        "questions": len(questions),
+        "answer_options": options,
+        "categories": len(category_ids),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    import asyncio
+    import sys
+
+    from pdd_app.db.database import AsyncSessionLocal
+
+    parser = argparse.ArgumentParser(prog='python -m pdd_app.db.question_import')
+    parser.add_argument('path')
+    parser.add_argument('--dry-run', action='store_true', help='только проверить файл')
+    args = parser.parse_args()
+
+    async def main():
+        with open(args.path, 'rb') as f:
+            data = f.read()
+        try:
+            questions = validate(parse(data, args.path))
+        except QuestionImportError as e:
+            for error in e.errors:
+                print(f'строка {error["row"]}: {"; ".join(error["errors"])}', file=sys.stderr)
+            sys.exit(1)
+        if args.dry_run:
+            print(f'{len(questions)} вопросов, ошибок нет')
+            return
+        async with AsyncSessionLocal() as db:
+            report = await import_questions(db, questions)
+            await db.commit()
+        print(json.dumps(report, ensure_ascii=False))
+
+    asyncio.run(main())
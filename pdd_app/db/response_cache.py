@@ -0,0 +1,284 @@
+"""Кэш готовых JSON-ответов каталожных роутов, общий для воркеров через Redis.
+
+Запись живёт CACHE_TTL секунд и помечена тегами - таблицами, из которых
+собран ответ. В ключ входят версии этих таблиц из table_versions
+(pdd_app.db.table_versions): любая запись в таблицу, кроме счётчиков, меняет
+версию в той же транзакции, и старые записи кэша больше не читаются ни одним
+воркером. Счётчики лайков и просмотров в списках отстают не больше чем на TTL.
+invalidate(тег) из роутов только освобождает память сразу, не дожидаясь TTL.
+
+CACHE_BACKEND=redis - общий кэш в Redis из docker-compose, memory - словарь
+в процессе (для тестов и запуска без Redis), off - без кэша. Ошибка Redis
+не роняет запрос: он считается промахом и идёт в базу.
+
+ETag - хеш ключа, то есть query-параметров и версий таблиц, а не тела:
+If-None-Match отвечается 304 после одного запроса по первичному ключу
+table_versions, без загрузки ORM-объектов и сериализации.
+"""
+import hashlib
+import logging
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from pdd_app.config import CACHE_BACKEND, CACHE_TTL, REDIS_URL
+from pdd_app.db.table_versions import read_versions
+
+logger = logging.getLogger(__name__)
+
+CACHE_HEADER = 'X-Cache'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # для If-None-Match сравнение слабое: W/"x" совпадает с "x"
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+class MemoryCacheBackend:
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, bytes, Tuple[str, ...]]] = {}
+        self._tags: Dict[str, Set[str]] = {}
+
+    def _drop(self, key: str):
+        # ключ уходит и из множеств своих тегов, иначе они растут без предела
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            return None
+        return entry[1]
+
+    async def set(self, key: str, body: bytes, tags: Iterable[str], ttl: float):
+        tags = tuple(tags)
+        self._drop(key)
+        if len(self._entries) >= self.max_entries:
+            now = time.monotonic()
+            for expired in [k for k, entry in self._entries.items() if entry[0] <= now]:
+                self._drop(expired)
+            if len(self._entries) >= self.max_entries:
+                self._drop(next(iter(self._entries)))
+        self._entries[key] = (time.monotonic() + ttl, body, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        removed = 0
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                removed += self._drop(key)
+        return removed
+
+    async def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+
+    async def close(self):
+        pass
+
+
+class RedisCacheBackend:
+    """Ответ - строка с EX ttl, тег - множество ключей своих ответов.
+
+    Срок множеству тега ставится только при создании (EXPIRE NX), так что под
+    постоянной нагрузкой оно всё равно истекает и не копит ключи. Ключи,
+    добавленные незадолго до этого, переживут множество, но в ключ входят
+    версии тегов: после изменения данных такие записи уже никто не прочитает.
+    """
+
+    def __init__(self, url: str, prefix: str = 'pdd:cache:'):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self.prefix = prefix
+
+    def _tag(self, tag: str) -> str:
+        return f'{self.prefix}tag:{tag}'
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.redis.get(self.prefix + key)
+
+    async def set(self, key: str, body: bytes, tags: Iterable[str], ttl: float):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(self.prefix + key, body, px=int(ttl * 1000))
+            for tag in tags:
+                pipe.sadd(self._tag(tag), self.prefix + key)
+                pipe.expire(self._tag(tag), int(ttl) + 60, nx=True)
+            await pipe.execute()
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        removed = 0
+        for tag in tags:
+            # ключи тега забираются и удаляются атомарно вместе с самим множеством
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.smembers(self._tag(tag))
+                pipe.delete(self._tag(tag))
+                keys, _ = await pipe.execute()
+            if keys:
+                removed += await self.redis.delete(*keys)
+        return removed
+
+    async def clear(self):
+        keys = [key async for key in self.redis.scan_iter(match=self.prefix + '*')]
+        if keys:
+            await self.redis.delete(*keys)
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl: float = 60.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.not_modified: Counter = Counter()
+        self.invalidations = 0
+        self.errors = 0
+        self._adapters: Dict[object, TypeAdapter] = {}
+
+    def _adapter(self, model) -> TypeAdapter:
+        adapter = self._adapters.get(model)
+        if adapter is None:
+            adapter = self._adapters[model] = TypeAdapter(model)
+        return adapter
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        try:
+            return await self.backend.get(key)
+        except Exception:
+            self.errors += 1
+            logger.exception('response cache get %s failed', key)
+            return None
+
+    async def _set(self, key: str, body: bytes, tags, ttl: float):
+        try:
+            await self.backend.set(key, body, tags, ttl)
+        except Exception:
+            self.errors += 1
+            logger.exception('response cache set %s failed', key)
+
+    async def _tag_versions(self, db: AsyncSession, tags: List[str]) -> Optional[List[int]]:
+        try:
+            return await read_versions(db, tags)
+        except Exception:
+            self.errors += 1
+            logger.exception('table versions of %s are unavailable', ', '.join(tags))
+            return None
+
+    @staticmethod
+    def etag(key: str) -> str:
+        return '"' + hashlib.blake2b(key.encode(), digest_size=12).hexdigest() + '"'
+
+    async def response(self, request: Request, db: AsyncSession, name: str, tags: Iterable[str],
+                       build: Callable[[], Awaitable[object]], model,
+                       ttl: Optional[float] = None, exclude_none: bool = False) -> Response:
+        """304 по ETag, ответ из кэша или build() -> проверка по model -> JSON -> кэш.
+
+        Ключ - name, отсортированные query-параметры (?a=1&b=2 и ?b=2&a=1 совпадают)
+        и версии тегов. Версии читаются в той же сессии до build(): если запись
+        успеет между ними, тело ляжет под ключ старых версий, который больше никто не спросит.
+        """
+        tags = list(tags)
+        versions = await self._tag_versions(db, tags)
+        if versions is None:
+            # без версий нельзя ни отдать 304, ни безопасно положить тело в кэш
+            return Response(self._dump(await build(), model, exclude_none), media_type='application/json')
+
+        key = (name + '?' + '&'.join(f'{k}={v}' for k, v in sorted(request.query_params.multi_items()))
+               + '#' + ','.join(f'{tag}:{version}' for tag, version in zip(tags, versions)))
+        etag = self.etag(key)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get('if-none-match'), etag):
+            self.not_modified[name] += 1
+            return Response(status_code=304, headers=headers)
+
+        if self.backend is None:
+            body = self._dump(await build(), model, exclude_none)
+            return Response(body, media_type='application/json', headers=headers)
+
+        body = await self._get(key)
+        if body is not None:
+            self.hits[name] += 1
+            return Response(body, media_type='application/json', headers={**headers, CACHE_HEADER: 'HIT'})
+
+        self.misses[name] += 1
+        body = self._dump(await build(), model, exclude_none)
+        await self._set(key, body, tags, self.ttl if ttl is None else ttl)
+        return Response(body, media_type='application/json', headers={**headers, CACHE_HEADER: 'MISS'})
+
+    def _dump(self, result, model, exclude_none: bool) -> bytes:
+        adapter = self._adapter(model)
+        return adapter.dump_json(adapter.validate_python(result, from_attributes=True), exclude_none=exclude_none)
+
+    async def invalidate(self, *tags: str):
+        if self.backend is None:
+            return
+        self.invalidations += 1
+        try:
+            await self.backend.invalidate(tags)
+        except Exception:
+            self.errors += 1
+            logger.exception('response cache invalidation of %s failed', ', '.join(tags))
+
+    async def close(self):
+        if self.backend is not None:
+            await self.backend.close()
+
+    def stats(self):
+        def ratio(hits, misses):
+            return round(hits / (hits + misses), 4) if hits + misses else 0.0
+
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "ttl_s": self.ttl,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": ratio(hits, misses),
+            "not_modified": sum(self.not_modified.values()),
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "routes": {
+                name: {"hits": self.hits[name], "misses": self.misses[name],
+                       "hit_ratio": ratio(self.hits[name], self.misses[name]),
+                       "not_modified": self.not_modified[name]}
+                for name in sorted(set(self.hits) | set(self.misses) | set(self.not_modified))
+            },
+        }
+
+
+def make_response_cache():
+    if CACHE_BACKEND == 'redis':
+        backend = RedisCacheBackend(REDIS_URL)
+    elif CACHE_BACKEND == 'memory':
+        backend = MemoryCacheBackend()
+    else:
+        backend = None
+    return ResponseCache(backend, ttl=CACHE_TTL)
+
+
+response_cache = make_response_cache()
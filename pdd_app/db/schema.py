@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, model_validator
 from typing import Optional, List
 from datetime import datetime
 from pdd_app.db.models import QuestionDifficulty, ExamStatus
@@ -16,6 +16,19 @@ class UserSchema(BaseModel):
         from_attributes = True
 
 
+class UserProfileSchema(BaseModel):
+    # ответ о пользователе: без password, в нём хеш
+    id: int
+    username: str
+    email: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    age: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
 class UserCreateSchema(BaseModel):
     email: EmailStr
     username: str
@@ -54,6 +67,8 @@ class QuestionSchema(BaseModel):
     explanation: str
     category_id: int
     difficulty: QuestionDifficulty
+    likes_count: int = 0
+    comments_count: int = 0
 
     class Config:
         from_attributes = True
@@ -79,6 +94,12 @@ class AnswerOptionSchema(BaseModel):
         from_attributes = True
 
 
+class QuestionDetailSchema(QuestionSchema):
+    # заполняются только при ?embed=..., иначе не попадают в ответ
+    answer_options: Optional[List[AnswerOptionSchema]] = None
+    category: Optional[CategorySchema] = None
+
+
 class AnswerOptionCreateSchema(BaseModel):
     text: str
     question_id: int
@@ -117,6 +138,8 @@ class VideoSchema(BaseModel):
     description: Optional[str]
     url: str
     views_count: Optional[int] = 0
+    likes_count: int = 0
+    comments_count: int = 0
 
     class Config:
         from_attributes = True
@@ -132,12 +155,14 @@ class VideoCreateSchema(BaseModel):
 
 
 class CommentSchema(BaseModel):
+    # только для ответа: likes_count ведёт pdd_app.db.counters, клиент его не задаёт
     id: int
     text: str
     user_id: int
     question_id: Optional[int] = None
     video_id: Optional[int] = None
     created_at: datetime
+    likes_count: int = 0
 
     class Config:
         from_attributes = True
@@ -184,3 +209,22 @@ class LikeCreateSchema(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class AnswerOptionImportSchema(BaseModel):
+    text: str = Field(min_length=1)
+    is_correct: bool = False
+
+
+class QuestionImportSchema(BaseModel):
+    text: str = Field(min_length=1)
+    explanation: str = ''
+    difficulty: QuestionDifficulty
+    category: str = Field(min_length=1)
+    answer_options: List[AnswerOptionImportSchema] = Field(min_length=2)
+
+    @model_validator(mode='after')
+    def check_correct_answer(self):
+        if not any(option.is_correct for option in self.answer_options):
+            raise ValueError('нет правильного варианта ответа')
+        return self
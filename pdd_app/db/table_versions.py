@@ -0,0 +1,99 @@
+"""Версии таблиц каталога для ETag и ключей кэша ответов.
+
+Любая запись в отслеживаемую таблицу через Session (роуты, импорт, sqladmin)
+в той же транзакции увеличивает её строку в table_versions, поэтому версия
+общая для всех воркеров, не сбрасывается при рестарте и становится видна
+ровно вместе с данными. За транзакцию строка увеличивается один раз.
+
+Версия берётся первой, до строк данных (before_flush и do_orm_execute
+срабатывают до записи), и несколько версий - в порядке имён таблиц: у всех
+транзакций один порядок блокировок, без взаимных блокировок в Postgres.
+
+Денормализованные счётчики (likes_count, comments_count, views_count) версию
+не меняют: иначе каждый лайк и сброс просмотров вставал бы в очередь на одну
+строку table_versions и сбрасывал кэш списков. В кэшированных списках они
+отстают не больше чем на CACHE_TTL. Запрос только по счётчикам помечается
+execution_options(table_versions=False).
+"""
+from typing import List
+
+from sqlalchemy import event, inspect, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from pdd_app.db.models import TableVersion
+
+# таблицы, из которых собираются кэшируемые ответы
+TRACKED = frozenset({'categories', 'questions', 'answer_options', 'videos'})
+COUNTER_COLUMNS = frozenset({'likes_count', 'comments_count', 'views_count'})
+
+
+def _bump(connection, tables):
+    tables = sorted(tables)
+    result = connection.execute(update(TableVersion).where(TableVersion.table_name.in_(tables))
+                                .values(version=TableVersion.version + 1))
+    if result.rowcount < len(tables):
+        # строки создаёт миграция; без неё (create_all) заводим недостающие
+        existing = set(connection.execute(
+            select(TableVersion.table_name).where(TableVersion.table_name.in_(tables))).scalars())
+        connection.execute(insert(TableVersion),
+                           [{"table_name": name, "version": 1} for name in tables if name not in existing])
+
+
+async def read_versions(db: AsyncSession, tables: List[str]) -> List[int]:
+    versions = dict((await db.execute(
+        select(TableVersion.table_name, TableVersion.version)
+        .where(TableVersion.table_name.in_(tables)))).all())
+    return [versions.get(name, 0) for name in tables]
+
+
+def _mark(session, tables):
+    bumped = session.info.setdefault('table_versions_bumped', set())
+    tables = (set(tables) & TRACKED) - bumped
+    if tables:
+        bumped.update(tables)
+        _bump(session.connection(), tables)
+
+
+def _content_changed(obj) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[attr.key].history.has_changes()
+               for attr in state.mapper.column_attrs if attr.key not in COUNTER_COLUMNS)
+
+
+def _flush_tables(session):
+    tables = {obj.__table__.name for obj in session.new if hasattr(obj, '__table__')}
+    tables |= {obj.__table__.name for obj in session.dirty
+               if hasattr(obj, '__table__') and _content_changed(obj)}
+    for obj in session.deleted:
+        if not hasattr(obj, '__table__'):
+            continue
+        tables.add(obj.__table__.name)
+        # при удалении flush обнуляет внешние ключи детей или чистит таблицу связи
+        for rel in inspect(obj).mapper.relationships:
+            if rel.uselist:
+                tables.add((rel.secondary if rel.secondary is not None else rel.mapper.local_table).name)
+    return tables
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_before_flush(session, flush_context, instances):
+    _mark(session, _flush_tables(session))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bump_statement(orm_execute_state):
+    # insert()/update()/delete() через session.execute идут мимо flush (импорт, sqladmin)
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if orm_execute_state.execution_options.get('table_versions', True) is False:
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if table is not None and getattr(table, 'name', None) in TRACKED:
+        _mark(orm_execute_state.session, {table.name})
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _reset(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('table_versions_bumped', None)
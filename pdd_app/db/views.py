@@ -0,0 +1,269 @@
+"""Буфер просмотров видео: вместо UPDATE на каждый просмотр - один UPDATE на видео за период.
+
+Просмотры копятся в памяти воркера (VIEWS_BACKEND=memory) или в Redis
+(VIEWS_BACKEND=redis, общий для всех воркеров) и раз в VIEWS_FLUSH_INTERVAL
+секунд прибавляются к videos.views_count. Доставка at-least-once: пачка
+удаляется из буфера только после commit, при ошибке базы она остаётся и
+уходит со следующим сбросом. Окно потерь - не больше одного интервала для
+памяти при падении процесса; для Redis - то, что Redis не успел сохранить.
+Недоступный буфер не роняет запрос: просмотр теряется и считается в dropped_views.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, func, update
+
+from pdd_app.config import REDIS_URL, VIEWS_BACKEND, VIEWS_FLUSH_INTERVAL
+from pdd_app.db.models import Video
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryViewStore:
+    # пачку забирает только этот процесс: продлевать нечего
+    lease = None
+
+    def __init__(self):
+        self._pending: Counter = Counter()
+
+    async def add(self, video_id: int, count: int = 1):
+        self._pending[video_id] += count
+
+    async def take(self) -> Dict[int, int]:
+        pending, self._pending = self._pending, Counter()
+        return dict(pending)
+
+    async def done(self, counts: Dict[int, int]):
+        pass
+
+    async def restore(self, counts: Dict[int, int]):
+        self._pending.update(counts)
+
+    async def extend(self) -> bool:
+        return True
+
+    async def pending(self) -> int:
+        return sum(self._pending.values())
+
+    async def close(self):
+        pass
+
+
+class RedisViewStore:
+    """Счётчики в хеше Redis; сброс переименовывает его в flushing и удаляет после commit.
+
+    Сбрасывает один воркер за раз (lease-замок с токеном сброса). Пока идёт
+    UPDATE, ViewCounter продлевает замок, а перед commit проверяет, что он
+    всё ещё свой: иначе FLUSHING мог забрать другой воркер, и транзакция
+    откатывается вместо двойного счёта. Если процесс упал между commit и
+    удалением, пачка будет прибавлена ещё раз - это и есть at-least-once.
+    """
+
+    PENDING = 'pdd:views:pending'
+    FLUSHING = 'pdd:views:flushing'
+    LOCK = 'pdd:views:lock'
+
+    # продлить / снять замок, только если он всё ещё наш
+    EXTEND = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+    UNLOCK = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url: str, lease: float = 30.0):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url)
+        self._response_error = redis.ResponseError
+        self.lease = lease
+        self._token = ''
+        self._extend = self.redis.register_script(self.EXTEND)
+        self._unlock_script = self.redis.register_script(self.UNLOCK)
+
+    async def add(self, video_id: int, count: int = 1):
+        await self.redis.hincrby(self.PENDING, video_id, count)
+
+    async def take(self) -> Dict[int, int]:
+        self._token = uuid.uuid4().hex
+        if not await self.redis.set(self.LOCK, self._token, nx=True, px=int(self.lease * 1000)):
+            # сбрасывает другой воркер
+            return {}
+        # пачка, не удалённая прошлым сбросом (ошибка базы или падение), идёт первой
+        if not await self.redis.exists(self.FLUSHING):
+            try:
+                await self.redis.rename(self.PENDING, self.FLUSHING)
+            except self._response_error:
+                # новых просмотров нет: PENDING не существует
+                return {}
+        counts = await self.redis.hgetall(self.FLUSHING)
+        return {int(video_id): int(count) for video_id, count in counts.items()}
+
+    async def done(self, counts: Dict[int, int]):
+        if counts:
+            await self.redis.delete(self.FLUSHING)
+        await self._unlock()
+
+    async def restore(self, counts: Dict[int, int]):
+        # пачка остаётся в FLUSHING до следующей попытки
+        await self._unlock()
+
+    async def extend(self) -> bool:
+        return bool(await self._extend(keys=[self.LOCK], args=[self._token, int(self.lease * 1000)]))
+
+    async def _unlock(self):
+        await self._unlock_script(keys=[self.LOCK], args=[self._token])
+
+    async def pending(self) -> int:
+        total = 0
+        for key in (self.PENDING, self.FLUSHING):
+            total += sum(int(count) for count in (await self.redis.hvals(key)))
+        return total
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+class ViewCounter:
+    def __init__(self, store, flush_interval: float = 5.0, engine=None):
+        self.store = store
+        self.flush_interval = flush_interval
+        self._engine = engine
+
+        self.views = 0
+        self.dropped_views = 0
+        self.flushed_views = 0
+        self.flushed_videos = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from pdd_app.db.database import async_engine
+            self._engine = async_engine
+        return self._engine
+
+    async def add(self, video_id: int, count: int = 1):
+        """Не бросает: при недоступном буфере просмотр теряется, а ответ роута важнее."""
+        self.views += count
+        try:
+            await self.store.add(video_id, count)
+        except Exception:
+            if not self.dropped_views:
+                logger.exception('view counter: buffer is unavailable, views are dropped')
+            else:
+                logger.warning('view counter: buffer is unavailable, %d views dropped', self.dropped_views + count)
+            self.dropped_views += count
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        else:
+            await self.flush()
+        await self.store.close()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+        # финальный сброс при остановке
+        await self.flush()
+
+    async def flush(self):
+        try:
+            counts = await self.store.take()
+        except Exception:
+            logger.exception('view counter: buffer is unavailable')
+            self.failed_flushes += 1
+            return
+        if not counts:
+            await self.store.done(counts)
+            return
+
+        started = time.perf_counter()
+        keeper = asyncio.get_running_loop().create_task(self._keep_lease()) if self.store.lease else None
+        try:
+            await self._update(counts)
+        except Exception:
+            logger.exception('view counter flush of %d videos failed', len(counts))
+            self.failed_flushes += 1
+            await self.store.restore(counts)
+            return
+        finally:
+            if keeper is not None:
+                keeper.cancel()
+        await self.store.done(counts)
+        self.flushes += 1
+        self.flushed_videos += len(counts)
+        self.flushed_views += sum(counts.values())
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    async def _keep_lease(self):
+        while True:
+            await asyncio.sleep(self.store.lease / 3)
+            try:
+                await self.store.extend()
+            except Exception:
+                logger.exception('view counter: lease extension failed')
+
+    async def _update(self, counts: Dict[int, int]):
+        table = Video.__table__
+        query = (update(table).where(table.c.id == bindparam('video_id'))
+                 .values(views_count=func.coalesce(table.c.views_count, 0) + bindparam('views')))
+        # по возрастанию id: два сбрасывающих процесса блокируют строки в одном порядке
+        rows = [{"video_id": video_id, "views": counts[video_id]} for video_id in sorted(counts)]
+        async with self.engine.begin() as connection:
+            # версию videos не поднимаем: views_count в кэше списка отстаёт не больше CACHE_TTL
+            await connection.execute(query, rows)
+            if not await self.store.extend():
+                # замок истёк и пачку мог забрать другой воркер: откат вместо двойного счёта
+                raise RuntimeError('view counter flush lease is lost')
+
+    async def stats(self):
+        try:
+            pending = await self.store.pending()
+        except Exception as e:
+            pending = f'unavailable: {e}'
+        return {
+            "backend": type(self.store).__name__,
+            "flush_interval_s": self.flush_interval,
+            "views": self.views,
+            "dropped_views": self.dropped_views,
+            "pending": pending,
+            "flushes": self.flushes,
+            "flushed_views": self.flushed_views,
+            "flushed_videos": self.flushed_videos,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+def make_view_counter():
+    if VIEWS_BACKEND == 'redis':
+        store = RedisViewStore(REDIS_URL, lease=max(30.0, VIEWS_FLUSH_INTERVAL * 5))
+    else:
+        store = MemoryViewStore()
+    return ViewCounter(store, flush_interval=VIEWS_FLUSH_INTERVAL)
+
+
+view_counter = make_view_counter()
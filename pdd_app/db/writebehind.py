@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import Table, insert
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Копит строки в памяти и пишет их пачками (multi-row INSERT) в фоне.
+
+    Сброс по размеру (flush_size) или по времени (flush_interval).
+    Если очередь переполнена, новые строки отбрасываются и считаются в dropped.
+    """
+
+    def __init__(self, table: Table, max_queue: int = 10000, flush_size: int = 500,
+                 flush_interval: float = 1.0, engine=None):
+        self.table = table
+        self.max_queue = max_queue
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._engine = engine
+
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+
+        self._queue: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from pdd_app.db.database import async_engine
+            self._engine = async_engine
+        return self._engine
+
+    def add(self, record: dict) -> bool:
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return False
+        self._queue.append(record)
+        if len(self._queue) >= self.flush_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            await self.flush()
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+        # финальный сброс при остановке
+        await self.flush()
+
+    async def flush(self):
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.flush_size, len(self._queue)))]
+            started = time.perf_counter()
+            try:
+                await self._insert(batch)
+            except Exception:
+                logger.exception('write-behind flush into %s failed', self.table.name)
+                self.failed_flushes += 1
+                if self._stopping:
+                    self.dropped += len(batch)
+                else:
+                    # вернём в начало очереди, что не влезло - теряем
+                    room = max(0, self.max_queue - len(self._queue))
+                    self._queue.extendleft(reversed(batch[:room]))
+                    self.dropped += len(batch) - min(room, len(batch))
+                return
+            self.written += len(batch)
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    async def _insert(self, batch):
+        async with self.engine.begin() as connection:
+            await connection.execute(insert(self.table), batch)
+
+    def stats(self):
+        return {
+            "queue_depth": len(self._queue),
+            "max_queue": self.max_queue,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": self.last_flush_ms,
+        }
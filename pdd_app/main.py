@@ -1,22 +1,42 @@
+import logging
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI
 import uvicorn
 from pdd_app.api import (
     category, auth, exam, questions, answeroptions,
-    video, users, pdd_pr
+    video, users, pdd_pr, system, exports, comments
 )
-from pdd_app.db.database import SessionLocal
+from pdd_app.config import CACHE_BACKEND, MODEL_PRELOAD, UVICORN_WORKERS
+from pdd_app.db.database import async_engine
+from pdd_app.db.replicas import replicas
+from pdd_app.db.response_cache import response_cache
+from pdd_app.db.views import view_counter
+from pdd_app.ml.runtime import runtime
 
+logger = logging.getLogger(__name__)
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
-app = FastAPI(title="PDD API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # модель грузится в фоне, CRUD-роуты доступны сразу
+    if MODEL_PRELOAD:
+        runtime.start()
+    if CACHE_BACKEND == 'memory' and UVICORN_WORKERS > 1:
+        logger.warning('CACHE_BACKEND=memory with %d workers: invalidation reaches only the worker '
+                       'that handled the write, others serve stale lists up to CACHE_TTL; '
+                       'use CACHE_BACKEND=redis', UVICORN_WORKERS)
+    view_counter.start()
+    yield
+    await runtime.stop()
+    await view_counter.stop()
+    await response_cache.close()
+    await async_engine.dispose()
+    await replicas.dispose()
+
+
+app = FastAPI(title="PDD API", lifespan=lifespan)
 
 app.include_router(category.category_router)
 app.include_router(auth.auth_router)
@@ -24,8 +44,13 @@ app.include_router(exam.exam_router)
 app.include_router(questions.question_router)
 app.include_router(answeroptions.answer_router)
 app.include_router(video.video_router)
+app.include_router(users.user_router)
+app.include_router(comments.comment_router)
+app.include_router(comments.like_router)
 app.include_router(auth.auth_router)
 app.include_router(pdd_pr.model_router)
+app.include_router(system.system_router)
+app.include_router(exports.export_router)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,71 @@
+from pathlib import Path
+import torch
+
+from pdd_app.config import MODEL_EXPORT_DIR
+from pdd_app.ml.model import BASE_DIR, MODEL_PATH, CheckImage
+
+# ================= BACKENDS =================
+EXPORT_DIR = Path(MODEL_EXPORT_DIR) if MODEL_EXPORT_DIR else BASE_DIR / "exported"
+
+ARTIFACTS = {
+    'torchscript': 'check_image.torchscript.pt',
+    'onnx': 'check_image.onnx',
+    'int8-dynamic': 'check_image.int8_dynamic.pt',
+    'int8-static': 'check_image.int8_static.pt',
+}
+BACKENDS = ('eager',) + tuple(ARTIFACTS)
+
+# квантованные модели и onnxruntime считаются только на CPU
+GPU_BACKENDS = ('eager', 'torchscript')
+
+
+def artifact_path(backend: str) -> Path:
+    if backend == 'eager':
+        return MODEL_PATH
+    if backend not in ARTIFACTS:
+        raise ValueError(f'Неизвестный backend: {backend} (доступны: {", ".join(BACKENDS)})')
+    return EXPORT_DIR / ARTIFACTS[backend]
+
+
+def backend_device(backend: str) -> torch.device:
+    if backend in GPU_BACKENDS and torch.cuda.is_available():
+        return torch.device('cuda')
+    return torch.device('cpu')
+
+
+def load_eager(device: torch.device, path: Path = MODEL_PATH) -> CheckImage:
+    model = CheckImage()
+    model.load_state_dict(torch.load(path, map_location=device))
+    model.to(device)
+    model.eval()
+    return model
+
+
+class OnnxBackend:
+    def __init__(self, path: Path):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise RuntimeError('Для backend=onnx нужен onnxruntime: pip install onnxruntime') from e
+
+        self.session = onnxruntime.InferenceSession(str(path), providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        outputs = self.session.run(None, {self.input_name: batch.cpu().numpy()})
+        return torch.from_numpy(outputs[0])
+
+
+def load_backend(backend: str, device: torch.device):
+    path = artifact_path(backend)
+    if backend == 'eager':
+        return load_eager(device, path)
+
+    if not path.exists():
+        raise RuntimeError(f'{path} не найден, сначала выполните: python -m pdd_app.ml.export build')
+    if backend == 'onnx':
+        return OnnxBackend(path)
+
+    module = torch.jit.load(str(path), map_location=device)
+    module.eval()
+    return module
@@ -0,0 +1,136 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from typing import Any, Callable, List, Optional
+
+
+class BatchScheduler:
+    """Собирает одновременные запросы в один батч и считает его в отдельном пуле потоков.
+
+    preprocess(payload) -> tensor вызывается для каждого элемента,
+    infer(list[tensor]) -> list[result] один раз на батч.
+    Оба вызова идут в executor, event loop не блокируется. На каждый поток
+    executor'а - своя задача-сборщик: батчи собираются по очереди, а считаются
+    параллельно, пока предыдущие ещё в инференсе.
+    """
+
+    def __init__(self, preprocess: Callable[[Any], Any], infer: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0, workers: int = 1,
+                 initializer: Optional[Callable[[], None]] = None):
+        self.preprocess = preprocess
+        self.infer = infer
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.workers = max(1, workers)
+        self.initializer = initializer
+
+        self._pending: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._gather: Optional[asyncio.Lock] = None
+        self._tasks: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self):
+        if any(not task.done() for task in self._tasks):
+            return
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='pdd-infer',
+                                            initializer=self.initializer)
+        self._wakeup = asyncio.Event()
+        self._gather = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        while self._pending:
+            _, future, _ = self._pending.popleft()
+            future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def submit(self, payload):
+        self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((payload, future, loop.time()))
+        self._wakeup.set()
+        return await future
+
+    def infer_blocking(self, tensors):
+        """Готовый батч из другого потока (видео): считается в том же executor'е, что и запросы."""
+        executor = self._executor
+        if executor is None:
+            raise RuntimeError('BatchScheduler is stopped')
+        return executor.submit(self.infer, tensors).result()
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # собирает один воркер за раз, остальные в это время считают свои батчи
+            async with self._gather:
+                batch = await self._next_batch(loop)
+
+            try:
+                results = await loop.run_in_executor(self._executor, self._run_batch,
+                                                     [payload for payload, _, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+
+            for (_, future, _), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def _next_batch(self, loop):
+        while True:
+            await self._wakeup.wait()
+            if not self._pending:
+                self._wakeup.clear()
+                continue
+
+            # ждём, пока батч заполнится или истечёт время первого запроса
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                item = self._pending.popleft()
+                if not item[1].cancelled():
+                    batch.append(item)
+            if not self._pending:
+                self._wakeup.clear()
+            if batch:
+                return batch
+
+    def _run_batch(self, payloads):
+        results: List[Any] = [None] * len(payloads)
+        tensors, index = [], []
+        for i, payload in enumerate(payloads):
+            try:
+                tensors.append(self.preprocess(payload))
+                index.append(i)
+            except Exception as e:
+                results[i] = e
+
+        if tensors:
+            for i, output in zip(index, self.infer(tensors)):
+                results[i] = output
+        return results
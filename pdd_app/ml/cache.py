@@ -0,0 +1,157 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+Prediction = Tuple[int, float]
+
+logger = logging.getLogger(__name__)
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_fingerprint(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+class PddClassStore:
+    """Постоянный уровень кэша: читает историю предсказаний из pdd_classes.
+
+    Строки туда пишет WriteBehindBuffer из ModelRuntime.
+    """
+
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+
+    def _session(self):
+        if self._session_factory is None:
+            from pdd_app.db.database import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+    async def get(self, image_hash: str, model_version: str) -> Optional[Tuple[str, float]]:
+        from sqlalchemy import select
+        from pdd_app.db.models import PddClass
+
+        async with self._session() as db:
+            row = (await db.execute(
+                select(PddClass.predicted_label, PddClass.confidence)
+                .where(PddClass.image_hash == image_hash,
+                       PddClass.model_version == model_version)
+                .limit(1)
+            )).first()
+        return (row.predicted_label, row.confidence) if row else None
+
+
+class PredictionCache:
+    """LRU-кэш предсказаний по sha256 загруженных байтов.
+
+    Сбрасывается, когда меняется файл весов модели.
+    """
+
+    def __init__(self, weights_path: Path, labels: List[str], max_entries: int = 10000,
+                 store: Optional[PddClassStore] = None, check_interval: float = 1.0):
+        self.weights_path = weights_path
+        self.labels = labels
+        self.max_entries = max_entries
+        self.store = store
+        self.check_interval = check_interval
+
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stamp = self._stat()
+        self._checked_at = time.monotonic()
+        self.model_version = file_fingerprint(weights_path) if self._stamp else None
+
+    def _stat(self):
+        try:
+            st = self.weights_path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def check_weights(self) -> bool:
+        """True, если файл весов изменился с прошлой проверки (кэш при этом очищается)."""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+
+        stamp = self._stat()
+        if stamp is None or stamp == self._stamp:
+            return False
+        with self._lock:
+            if stamp == self._stamp:
+                return False
+            self._stamp = stamp
+            self.model_version = file_fingerprint(self.weights_path)
+            self._entries.clear()
+            self.invalidations += 1
+        return True
+
+    def get(self, key: str) -> Optional[Prediction]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    async def load(self, key: str) -> Optional[Prediction]:
+        """Промах в памяти: ищем в pdd_classes."""
+        row = None
+        if self.store is not None:
+            try:
+                row = await self.store.get(key, self.model_version)
+            except Exception:
+                logger.exception('pdd_classes cache lookup failed')
+        with self._lock:
+            if row is None or row[0] not in self.labels:
+                self.misses += 1
+                return None
+            self.persistent_hits += 1
+        value = (self.labels.index(row[0]), row[1])
+        self.put(key, value)
+        return value
+
+    def put(self, key: str, value: Prediction):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.persistent_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "persistent": self.store is not None,
+            "model_version": self.model_version,
+        }
@@ -0,0 +1,147 @@
+"""Экспорт CheckImage в TorchScript / ONNX / int8 и проверка совпадения с eager.
+
+    python -m pdd_app.ml.export build --calibration data/signs
+    python -m pdd_app.ml.export parity data/signs
+"""
+import argparse
+import inspect
+import sys
+from pathlib import Path
+from typing import List
+import torch
+import torch.nn as nn
+
+from pdd_app.ml.backends import ARTIFACTS, EXPORT_DIR, artifact_path, load_backend, load_eager
+from pdd_app.ml.model import MODEL_PATH
+from pdd_app.ml.preprocess import BatchBuffer, decode
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.bmp', '.ppm', '.webp'}
+INPUT_SHAPE = (1, 3, 128, 128)
+
+
+def load_images(directory: Path) -> List[Path]:
+    return sorted(p for p in directory.rglob('*') if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def load_batches(paths: List[Path], batch_size: int = 32):
+    # тот же препроцессинг, что и в /model/predict
+    buffers = BatchBuffer(batch_size)
+    for start in range(0, len(paths), batch_size):
+        chunk = paths[start:start + batch_size]
+        yield buffers.to_tensor([decode(p.read_bytes()) for p in chunk])
+
+
+def export_torchscript(model: nn.Module, path: Path):
+    traced = torch.jit.trace(model, torch.rand(INPUT_SHAPE))
+    torch.jit.save(torch.jit.freeze(traced), str(path))
+
+
+def export_onnx(model: nn.Module, path: Path):
+    kwargs = {}
+    # в новых версиях torch по умолчанию dynamo-экспортер, нам нужен классический
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        kwargs['dynamo'] = False
+    torch.onnx.export(
+        model, torch.rand(INPUT_SHAPE), str(path),
+        input_names=['image'], output_names=['logits'],
+        dynamic_axes={'image': {0: 'batch'}, 'logits': {0: 'batch'}},
+        opset_version=17, **kwargs
+    )
+
+
+def export_int8_dynamic(model: nn.Module, path: Path):
+    from torch.ao.quantization import quantize_dynamic
+
+    quantized = quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    traced = torch.jit.trace(quantized, torch.rand(INPUT_SHAPE))
+    torch.jit.save(torch.jit.freeze(traced), str(path))
+
+
+def export_int8_static(model: nn.Module, path: Path, calibration: List[Path]):
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    example = torch.rand(INPUT_SHAPE)
+    prepared = prepare_fx(model, get_default_qconfig_mapping('x86'), (example,))
+    with torch.no_grad():
+        if calibration:
+            for batch in load_batches(calibration):
+                prepared(batch)
+        else:
+            print('! нет изображений для калибровки, используются случайные тензоры', file=sys.stderr)
+            for _ in range(8):
+                prepared(torch.rand(32, *INPUT_SHAPE[1:]))
+    quantized = convert_fx(prepared)
+    traced = torch.jit.trace(quantized, example)
+    torch.jit.save(torch.jit.freeze(traced), str(path))
+
+
+def build(backends: List[str], calibration: List[Path]):
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    cpu = torch.device('cpu')
+    for backend in backends:
+        if backend == 'eager':
+            continue
+        # каждый экспорт получает свою копию, quantize/prepare_fx меняют модель
+        model = load_eager(cpu, MODEL_PATH)
+        path = artifact_path(backend)
+        if backend == 'torchscript':
+            export_torchscript(model, path)
+        elif backend == 'onnx':
+            export_onnx(model, path)
+        elif backend == 'int8-dynamic':
+            export_int8_dynamic(model, path)
+        elif backend == 'int8-static':
+            export_int8_static(model, path, calibration)
+        print(f'{backend}: {path}')
+
+
+def parity(backends: List[str], images: List[Path], min_agreement: float = 1.0) -> bool:
+    cpu = torch.device('cpu')
+    reference = load_eager(cpu, MODEL_PATH)
+    candidates = {name: load_backend(name, cpu) for name in backends if name != 'eager'}
+    matches = {name: 0 for name in candidates}
+
+    with torch.no_grad():
+        for batch in load_batches(images):
+            expected = reference(batch).argmax(dim=1)
+            for name, backend in candidates.items():
+                matches[name] += int((backend(batch).argmax(dim=1) == expected).sum())
+
+    ok = True
+    for name, matched in matches.items():
+        agreement = matched / len(images)
+        passed = agreement >= min_agreement
+        ok = ok and passed
+        print(f'{name}: top-1 {matched}/{len(images)} ({agreement:.2%}) {"OK" if passed else "FAIL"}')
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pdd_app.ml.export')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help='собрать артефакты из melis_model.pth')
+    build_parser.add_argument('--backend', action='append', choices=list(ARTIFACTS))
+    build_parser.add_argument('--calibration', type=Path, help='изображения для static int8')
+
+    parity_parser = commands.add_parser('parity', help='сравнить top-1 с eager на эталонных изображениях')
+    parity_parser.add_argument('images', type=Path)
+    parity_parser.add_argument('--backend', action='append', choices=list(ARTIFACTS))
+    parity_parser.add_argument('--min-agreement', type=float, default=1.0)
+
+    args = parser.parse_args(argv)
+    backends = args.backend or list(ARTIFACTS)
+
+    if args.command == 'build':
+        build(backends, load_images(args.calibration) if args.calibration else [])
+        return 0
+
+    images = load_images(args.images)
+    if not images:
+        parser.error(f'в {args.images} нет изображений')
+    return 0 if parity(backends, images, args.min_agreement) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
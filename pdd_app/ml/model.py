@@ -0,0 +1,93 @@
+from pathlib import Path
+import torch.nn as nn
+from torchvision import transforms
+
+# ================= PATH =================
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+MODEL_PATH = BASE_DIR / "melis_model.pth"
+
+# ================= CLASSES =================
+class_names = [
+    'Ограничение скорости (20 км/ч)',
+    'Ограничение скорости (30 км/ч)',
+    'Ограничение скорости (50 км/ч)',
+    'Ограничение скорости (60 км/ч)',
+    'Ограничение скорости (70 км/ч)',
+    'Ограничение скорости (80 км/ч)',
+    'Конец ограничения скорости (80 км/ч)',
+    'Ограничение скорости (100 км/ч)',
+    'Ограничение скорости (120 км/ч)',
+    'Обгон запрещён',
+    'Обгон запрещён для ТС более 3,5 тонн',
+    'Главная дорога на следующем перекрёстке',
+    'Главная дорога',
+    'Уступите дорогу',
+    'Стоп',
+    'Движение запрещено',
+    'Движение ТС более 3,5 тонн запрещено',
+    'Въезд запрещён',
+    'Общее предупреждение',
+    'Опасный поворот налево',
+    'Опасный поворот направо',
+    'Двойной поворот',
+    'Неровная дорога',
+    'Скользкая дорога',
+    'Сужение дороги справа',
+    'Дорожные работы',
+    'Светофорное регулирование',
+    'Пешеходы',
+    'Дети',
+    'Велосипедисты',
+    'Осторожно: лёд / снег',
+    'Дикие животные',
+    'Конец всех ограничений скорости и обгона',
+    'Поворот направо',
+    'Поворот налево',
+    'Движение прямо',
+    'Движение прямо или направо',
+    'Движение прямо или налево',
+    'Держаться правой стороны',
+    'Держаться левой стороны',
+    'Круговое движение',
+    'Конец запрета обгона',
+    'Конец запрета обгона для ТС более 3,5 тонн'
+]
+
+# ================= TRANSFORM =================
+transform = transforms.Compose([
+    transforms.Resize((128, 128)),
+    transforms.ToTensor()
+])
+
+# ================= MODEL =================
+class CheckImage(nn.Module):
+    def __init__(self):
+        super().__init__()
+
+        # 🔴 ИМЕНА СЛОЁВ ОСТАВЛЕНЫ КАК В .pth
+        self.first = nn.Sequential(
+            nn.Conv2d(3, 32, kernel_size=3, padding=1),
+            nn.ReLU(),
+            nn.MaxPool2d(2),
+            nn.Dropout2d(0.25),
+
+            nn.Conv2d(32, 64, kernel_size=3, padding=1),
+            nn.ReLU(),
+            nn.MaxPool2d(2),
+            nn.Dropout2d(0.25),
+
+            nn.AdaptiveAvgPool2d((1, 1))  # ✅ ИСПРАВЛЕНИЕ
+        )
+
+        self.second = nn.Sequential(
+            nn.Flatten(),
+            nn.Linear(64, 128),
+            nn.ReLU(),
+            nn.Dropout(0.5),
+            nn.Linear(128, 43)
+        )
+
+    def forward(self, x):
+        x = self.first(x)
+        x = self.second(x)
+        return x
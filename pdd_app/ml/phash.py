@@ -0,0 +1,257 @@
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+Prediction = Tuple[int, float]
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+# popcount по байтам: в numpy 1.26 ещё нет bitwise_count
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def dhash(image: Image.Image) -> int:
+    """64-битный difference hash: знак градиента яркости по строкам на сетке 9x8.
+
+    Устойчив к перекодированию JPEG, масштабу и небольшим сдвигам соседних кадров.
+    """
+    gray = np.asarray(image.convert('L').resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(hashes: np.ndarray, value: int) -> np.ndarray:
+    diff = np.bitwise_xor(hashes, np.uint64(value))
+    return _POPCOUNT[diff.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def _chunk_layout(max_distance: int):
+    # multi-index hashing: хеш режется на max_distance + 1 кусков, и по принципу
+    # Дирихле у соседа на расстоянии <= max_distance хотя бы один кусок совпадает точно
+    count = max_distance + 1
+    widths = [HASH_BITS // count + (1 if i < HASH_BITS % count else 0) for i in range(count)]
+    layout, shift = [], HASH_BITS
+    for width in widths:
+        shift -= width
+        layout.append((shift, (1 << width) - 1))
+    return layout
+
+
+class PerceptualIndex:
+    """Индекс почти-дубликатов по dHash с поиском в радиусе Хэмминга.
+
+    Основная часть лежит в отсортированных numpy-массивах (по одному на кусок хеша),
+    поиск - searchsorted по каждому куску и проверка кандидатов. Новые записи
+    копятся в хвосте, который просматривается целиком. Когда хвост длиннее
+    tail_limit, put() возвращает True, и вызывающий запускает merge() вне event loop:
+    слияние идёт без замка, get/put в это время работают со старыми таблицами.
+    """
+
+    def __init__(self, max_distance: int = 4, max_entries: int = 2_000_000,
+                 min_confidence: float = 0.8, snapshot_path: Optional[Path] = None,
+                 model_version: Optional[str] = None, tail_limit: int = 16384):
+        if not 0 <= max_distance < 16:
+            raise ValueError('max_distance должен быть от 0 до 15')
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.min_confidence = min_confidence
+        self.snapshot_path = snapshot_path
+        self.model_version = model_version
+        self.tail_limit = tail_limit
+
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+
+        self._layout = _chunk_layout(max_distance)
+        self._lock = threading.Lock()
+        # одно слияние за раз; _generation меняет clear/load, результат старого слияния отбрасывается
+        self._merge_lock = threading.Lock()
+        self._generation = 0
+        self._reset(capacity=1024)
+
+    def _reset(self, capacity: int):
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._classes = np.zeros(capacity, dtype=np.int32)
+        self._confidences = np.zeros(capacity, dtype=np.float32)
+        self._size = 0
+        self._indexed = 0
+        self._tables = [(np.empty(0, dtype=self._key_dtype(mask)), np.empty(0, dtype=np.int64))
+                        for _, mask in self._layout]
+        self._dirty = False
+        self._generation += 1
+
+    def __len__(self):
+        return self._size
+
+    # ================= LOOKUP =================
+    def _nearest(self, value: int):
+        best, best_distance = None, self.max_distance + 1
+        for (shift, mask), (keys, order) in zip(self._layout, self._tables):
+            key = keys.dtype.type((value >> shift) & mask)
+            lo = np.searchsorted(keys, key, side='left')
+            hi = np.searchsorted(keys, key, side='right')
+            if hi > lo:
+                candidates = order[lo:hi]
+                distances = hamming(self._hashes[candidates], value)
+                i = int(distances.argmin())
+                if distances[i] < best_distance:
+                    best, best_distance = int(candidates[i]), int(distances[i])
+
+        if self._size > self._indexed:
+            distances = hamming(self._hashes[self._indexed:self._size], value)
+            i = int(distances.argmin())
+            if distances[i] < best_distance:
+                best = self._indexed + i
+        return best
+
+    def get(self, value: int) -> Optional[Prediction]:
+        with self._lock:
+            i = self._nearest(value)
+            if i is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return int(self._classes[i]), float(self._confidences[i])
+
+    # ================= UPDATE =================
+    def put(self, value: int, prediction: Prediction) -> bool:
+        """Добавляет запись в хвост; True, если хвост пора влить в индекс через merge()."""
+        class_id, confidence = prediction
+        if confidence < self.min_confidence:
+            return False
+        with self._lock:
+            if self._size >= self.max_entries:
+                return False
+            if self._size == self._hashes.shape[0]:
+                self._grow(min(self.max_entries, self._size * 2))
+            i = self._size
+            self._hashes[i] = value
+            self._classes[i] = class_id
+            self._confidences[i] = confidence
+            self._size += 1
+            self._dirty = True
+            return self._size - self._indexed > self.tail_limit
+
+    def _grow(self, capacity: int):
+        for name in ('_hashes', '_classes', '_confidences'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _key_dtype(self, mask: int):
+        # узкий тип ключа: stable-сортировка uint16 в numpy поразрядная
+        for dtype in (np.uint16, np.uint32):
+            if mask <= np.iinfo(dtype).max:
+                return dtype
+        return np.uint64
+
+    def _keys(self, hashes: np.ndarray, shift: int, mask: int) -> np.ndarray:
+        keys = (hashes >> np.uint64(shift)) & np.uint64(mask)
+        return keys.astype(self._key_dtype(mask))
+
+    def merge(self):
+        """Вливает хвост в отсортированные таблицы; блокирующий, звать из потока, не из event loop."""
+        if not self._merge_lock.acquire(blocking=False):
+            # уже сливает другой поток, новые записи подхватит следующее слияние
+            return
+        try:
+            with self._lock:
+                start, stop, generation = self._indexed, self._size, self._generation
+                tail = self._hashes[start:stop].copy()
+                tables = self._tables
+            if stop == start:
+                return
+            # без замка: таблицы не меняются на месте, только заменяются целиком
+            tables = self._merged(tables, tail, start)
+            with self._lock:
+                if generation == self._generation:
+                    self._tables = tables
+                    self._indexed = stop
+                    self.rebuilds += 1
+        finally:
+            self._merge_lock.release()
+
+    def _merged(self, tables, tail: np.ndarray, start: int):
+        # сортируется только хвост, слияние с таблицами за O(n)
+        ids = np.arange(start, start + tail.shape[0])
+        merged = []
+        for (shift, mask), (keys, order) in zip(self._layout, tables):
+            tail_keys = self._keys(tail, shift, mask)
+            tail_order = np.argsort(tail_keys, kind='stable')
+            tail_keys = tail_keys[tail_order]
+            positions = np.searchsorted(keys, tail_keys, side='right')
+            merged.append((np.insert(keys, positions, tail_keys),
+                           np.insert(order, positions, ids[tail_order])))
+        return merged
+
+    def clear(self, model_version: Optional[str] = None):
+        with self._lock:
+            self.model_version = model_version
+            self._reset(capacity=1024)
+            self._dirty = True
+
+    # ================= SNAPSHOT =================
+    def save(self):
+        if self.snapshot_path is None or not self._dirty:
+            return
+        with self._lock:
+            size = self._size
+            data = {
+                "hashes": self._hashes[:size].copy(),
+                "classes": self._classes[:size].copy(),
+                "confidences": self._confidences[:size].copy(),
+            }
+            self._dirty = False
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.snapshot_path.with_name(self.snapshot_path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(f, model_version=np.array(self.model_version or ''),
+                     max_distance=np.array(self.max_distance), **data)
+        os.replace(tmp, self.snapshot_path)
+        logger.info('phash snapshot: %d entries -> %s', size, self.snapshot_path)
+
+    def load(self):
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return
+        try:
+            with np.load(self.snapshot_path) as snapshot:
+                if str(snapshot["model_version"]) != (self.model_version or ''):
+                    logger.info('phash snapshot %s is for another model, ignored', self.snapshot_path)
+                    return
+                hashes = snapshot["hashes"][:self.max_entries]
+                classes = snapshot["classes"][:self.max_entries]
+                confidences = snapshot["confidences"][:self.max_entries]
+        except (OSError, KeyError, ValueError):
+            logger.exception('phash snapshot %s is unreadable', self.snapshot_path)
+            return
+
+        with self._lock:
+            self._reset(capacity=max(1024, hashes.shape[0]))
+            self._size = hashes.shape[0]
+            self._hashes[:self._size] = hashes
+            self._classes[:self._size] = classes
+            self._confidences[:self._size] = confidences
+        self.merge()
+        logger.info('phash snapshot: loaded %d entries from %s', self._size, self.snapshot_path)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "indexed": self._indexed,
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "rebuilds": self.rebuilds,
+            "snapshot": str(self.snapshot_path) if self.snapshot_path else None,
+        }
@@ -0,0 +1,57 @@
+import io
+import threading
+from typing import List
+import numpy as np
+import torch
+from PIL import Image
+
+from pdd_app.config import PREDICT_MAX_IMAGE_PIXELS
+
+SIZE = (128, 128)
+
+
+def open_image(data: bytes, size=SIZE) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    # размер известен из заголовка, до декодирования пикселей
+    if image.width * image.height > PREDICT_MAX_IMAGE_PIXELS:
+        raise ValueError(f'Слишком большое изображение {image.width}x{image.height}')
+    # JPEG: draft декодирует в 1/2, 1/4 или 1/8 разрешения, но не меньше size
+    image.draft('RGB', size)
+    return image.convert("RGB")
+
+
+def resize(image: Image.Image, size=SIZE) -> Image.Image:
+    return image.resize(size, Image.BILINEAR, reducing_gap=3.0)
+
+
+def decode(data: bytes, size=SIZE) -> Image.Image:
+    """Декодирует сразу в уменьшенном размере и приводит к size (как transforms.Resize)."""
+    return resize(open_image(data, size), size)
+
+
+def blank(size=SIZE) -> Image.Image:
+    return Image.new("RGB", size)
+
+
+class BatchBuffer:
+    """Переиспользуемый uint8-буфер (N, H, W, 3) на каждый поток executor'а."""
+
+    def __init__(self, max_batch_size: int, size=SIZE):
+        self.max_batch_size = max_batch_size
+        self.size = size
+        self._local = threading.local()
+
+    def _buffer(self, n: int) -> np.ndarray:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or buffer.shape[0] < n:
+            width, height = self.size
+            buffer = np.empty((max(n, self.max_batch_size), height, width, 3), dtype=np.uint8)
+            self._local.buffer = buffer
+        return buffer[:n]
+
+    def to_tensor(self, images: List[Image.Image]) -> torch.Tensor:
+        buffer = self._buffer(len(images))
+        for i, image in enumerate(images):
+            buffer[i] = np.asarray(image)
+        # одна векторная операция на весь батч: HWC uint8 -> NCHW float [0, 1]
+        return torch.from_numpy(buffer).permute(0, 3, 1, 2).float().div_(255)
@@ -0,0 +1,107 @@
+import fcntl
+import logging
+import math
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+from pdd_app.config import (CPU_AFFINITY, PREDICT_WORKERS, TORCH_INTEROP_THREADS,
+                            TORCH_INTRA_THREADS, UVICORN_WORKERS)
+
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOT = Path('/sys/fs/cgroup')
+
+# держим открытым, пока жив процесс: lock-файл и есть "номер" воркера
+_slot_lock = None
+_slot: Optional[int] = None
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """Квота CPU контейнера в ядрах (cgroup v2 cpu.max или v1 cfs_quota), None если не задана."""
+    try:
+        quota, period = (CGROUP_ROOT / 'cpu.max').read_text().split()
+        if quota != 'max':
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int((CGROUP_ROOT / 'cpu' / 'cpu.cfs_quota_us').read_text())
+        period = int((CGROUP_ROOT / 'cpu' / 'cpu.cfs_period_us').read_text())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 else None
+
+
+def available_cpus() -> List[int]:
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def claim_worker_slot(workers: int) -> Optional[int]:
+    """Номер воркера uvicorn 0..workers-1 через flock, чтобы раздать непересекающиеся ядра."""
+    global _slot_lock, _slot
+    if _slot_lock is not None:
+        return _slot
+    for slot in range(workers):
+        path = Path(tempfile.gettempdir()) / f'pdd-worker-{slot}.lock'
+        handle = open(path, 'w')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            continue
+        _slot_lock, _slot = handle, slot
+        return slot
+    return None
+
+
+def plan_layout(workers: int = UVICORN_WORKERS):
+    cpus = available_cpus()
+    quota = cgroup_cpu_limit()
+    usable = max(1, min(len(cpus), math.floor(quota) if quota else len(cpus)))
+    per_worker = max(1, usable // max(1, workers))
+
+    layout = {
+        "cpus": len(cpus),
+        "cgroup_quota": quota,
+        "usable_cpus": usable,
+        "workers": workers,
+        "cpus_per_worker": per_worker,
+        "intra_op_threads": TORCH_INTRA_THREADS or max(1, per_worker // max(1, PREDICT_WORKERS)),
+        "inter_op_threads": TORCH_INTEROP_THREADS or 1,
+        "slot": None,
+        "affinity": None,
+    }
+    if CPU_AFFINITY and workers > 1:
+        slot = claim_worker_slot(workers)
+        if slot is not None:
+            layout["slot"] = slot
+            layout["affinity"] = cpus[slot * per_worker:(slot + 1) * per_worker] or cpus
+    return layout
+
+
+def apply_layout(layout, torch):
+    if layout["affinity"] and hasattr(os, 'sched_setaffinity'):
+        # sched_setaffinity(0) меняет только текущий поток, проходим по всем потокам процесса
+        for tid in os.listdir('/proc/self/task'):
+            try:
+                os.sched_setaffinity(int(tid), layout["affinity"])
+            except OSError:
+                pass
+
+    torch.set_num_threads(layout["intra_op_threads"])
+    try:
+        torch.set_num_interop_threads(layout["inter_op_threads"])
+    except RuntimeError:
+        # можно задать только до первой inter-op работы
+        layout["inter_op_threads"] = torch.get_num_interop_threads()
+
+    logger.info('cpu layout: %d usable cpus (quota %s) / %d workers -> intra-op %d, inter-op %d%s',
+                layout["usable_cpus"], layout["cgroup_quota"], layout["workers"],
+                layout["intra_op_threads"], layout["inter_op_threads"],
+                f', worker {layout["slot"]} pinned to {layout["affinity"]}' if layout["affinity"] else '')
+    return layout
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from pdd_app.config import (MODEL_LOAD_RETRY_MAX, MODEL_LOAD_RETRY_MIN, PREDICT_MAX_BATCH_SIZE, PREDICT_MAX_WAIT_MS, PREDICT_WORKERS,
+                            PREDICT_CACHE_SIZE, PREDICT_CACHE_PERSISTENT, INFERENCE_BACKEND,
+                            PREDICT_HISTORY, PREDICT_HISTORY_MAX_QUEUE, PREDICT_HISTORY_FLUSH_SIZE,
+                            PREDICT_HISTORY_FLUSH_INTERVAL, PREDICT_PHASH, PREDICT_PHASH_DISTANCE,
+                            PREDICT_PHASH_MAX_ENTRIES, PREDICT_PHASH_MIN_CONFIDENCE,
+                            PREDICT_PHASH_SNAPSHOT)
+from pdd_app.db.models import PddClass
+from pdd_app.db.writebehind import WriteBehindBuffer
+from pdd_app.ml.batching import BatchScheduler
+from pdd_app.ml.cache import PddClassStore, PredictionCache, hash_bytes
+from pdd_app.ml.phash import PerceptualIndex, dhash
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRuntime:
+    """Ленивая загрузка CheckImage: torch импортируется только в load().
+
+    Пока модель не готова, CRUD-роуты работают, а /model/* ждут загрузки.
+    Неудачная загрузка повторяется следующим запросом после паузы с
+    экспоненциальным ростом; до её конца /model/* сразу отвечают ошибкой.
+    """
+
+    def __init__(self, backend: str = INFERENCE_BACKEND):
+        self.backend = backend
+        self.ready = False
+        self.error: Optional[str] = None
+        self.timings = {}
+
+        self.model = None
+        self.device = None
+        self.labels = []
+        self.cache: Optional[PredictionCache] = None
+        # почти-дубликаты (соседние кадры, пережатые копии) по dHash
+        self.phash: Optional[PerceptualIndex] = None
+        self._phash_merge: Optional[asyncio.Future] = None
+        self.scheduler = BatchScheduler(
+            self.preprocess, self.predict_batch,
+            max_batch_size=PREDICT_MAX_BATCH_SIZE,
+            max_wait_ms=PREDICT_MAX_WAIT_MS,
+            workers=PREDICT_WORKERS,
+            initializer=self._init_inference_thread,
+        )
+        self.cpu_layout = None
+        # история предсказаний в pdd_classes, из неё же читает постоянный уровень кэша
+        self.history: Optional[WriteBehindBuffer] = None
+        if PREDICT_HISTORY or PREDICT_CACHE_PERSISTENT:
+            self.history = WriteBehindBuffer(
+                PddClass.__table__,
+                max_queue=PREDICT_HISTORY_MAX_QUEUE,
+                flush_size=PREDICT_HISTORY_FLUSH_SIZE,
+                flush_interval=PREDICT_HISTORY_FLUSH_INTERVAL,
+            )
+        self._loading: Optional[asyncio.Future] = None
+        self.load_failures = 0
+        self._retry_at = 0.0
+
+    # ================= LOAD =================
+    def load(self):
+        started = time.perf_counter()
+        import torch
+        from pdd_app.ml import preprocess
+        from pdd_app.ml.backends import EXPORT_DIR, artifact_path, backend_device, load_backend
+        from pdd_app.ml.model import class_names
+        from pdd_app.ml.resources import apply_layout, plan_layout
+
+        self._torch, self._preprocess = torch, preprocess
+        self.cpu_layout = apply_layout(plan_layout(), torch)
+        self._buffers = preprocess.BatchBuffer(PREDICT_MAX_BATCH_SIZE)
+        self._load_backend = load_backend
+        imported = time.perf_counter()
+
+        self.device = backend_device(self.backend)
+        self.model = load_backend(self.backend, self.device)
+        self.labels = class_names
+        self.cache = PredictionCache(
+            artifact_path(self.backend), class_names,
+            max_entries=PREDICT_CACHE_SIZE,
+            store=PddClassStore() if PREDICT_CACHE_PERSISTENT else None,
+        )
+        if PREDICT_PHASH:
+            self.phash = PerceptualIndex(
+                max_distance=PREDICT_PHASH_DISTANCE,
+                max_entries=PREDICT_PHASH_MAX_ENTRIES,
+                min_confidence=PREDICT_PHASH_MIN_CONFIDENCE,
+                snapshot_path=Path(PREDICT_PHASH_SNAPSHOT) if PREDICT_PHASH_SNAPSHOT
+                else EXPORT_DIR / f'phash-{self.backend}.npz',
+                model_version=self.cache.model_version,
+            )
+            self.phash.load()
+        loaded = time.perf_counter()
+
+        self.warmup()
+        finished = time.perf_counter()
+
+        self.timings = {
+            "import_ms": round((imported - started) * 1000, 1),
+            "load_ms": round((loaded - imported) * 1000, 1),
+            "warmup_ms": round((finished - loaded) * 1000, 1),
+            "total_ms": round((finished - started) * 1000, 1),
+        }
+        self.ready = True
+        logger.info('model %s ready on %s in %.1f ms (import %.1f, load %.1f, warmup %.1f)',
+                    self.backend, self.device, self.timings["total_ms"], self.timings["import_ms"],
+                    self.timings["load_ms"], self.timings["warmup_ms"])
+
+    def warmup(self):
+        # первый прогон выделяет буферы и выбирает ядра, не хотим платить за это в запросе
+        self.predict_batch([self._preprocess.blank()])
+
+    def reload(self):
+        self.model = self._load_backend(self.backend, self.device)
+        self.warmup()
+
+    def _init_inference_thread(self):
+        # число потоков torch задаётся и в потоках executor'а, где идёт инференс
+        if self.cpu_layout is not None:
+            self._torch.set_num_threads(self.cpu_layout["intra_op_threads"])
+
+    def start(self):
+        if (self._loading is not None and self._loading.done() and not self.ready
+                and time.monotonic() >= self._retry_at):
+            # прошлая попытка упала (или отменена): пауза прошла, грузим заново
+            self._loading = None
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(asyncio.to_thread(self.load))
+            self._loading.add_done_callback(self._on_loaded)
+        self.scheduler.start()
+        if self.history is not None:
+            self.history.start()
+
+    def _on_loaded(self, future: asyncio.Future):
+        if future.cancelled():
+            return
+        if future.exception() is None:
+            self.error = None
+            self.load_failures = 0
+            return
+        self.error = str(future.exception())
+        self.load_failures += 1
+        delay = min(MODEL_LOAD_RETRY_MAX, MODEL_LOAD_RETRY_MIN * 2 ** (self.load_failures - 1))
+        self._retry_at = time.monotonic() + delay
+        logger.error('model %s failed to load (attempt %d): %s; retry in %.0f s',
+                     self.backend, self.load_failures, self.error, delay)
+
+    async def wait_ready(self):
+        if self.ready:
+            return
+        self.start()
+        await asyncio.shield(self._loading)
+
+    async def stop(self):
+        await self.scheduler.stop()
+        if self._phash_merge is not None:
+            await asyncio.gather(self._phash_merge, return_exceptions=True)
+        if self.phash is not None:
+            try:
+                await asyncio.to_thread(self.phash.save)
+            except OSError:
+                logger.exception('phash snapshot failed')
+        if self.history is not None:
+            await self.history.stop()
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "backend": self.backend,
+            "device": str(self.device) if self.device else None,
+            "error": self.error,
+            "load_failures": self.load_failures,
+            "timings": self.timings,
+            "cpu_layout": self.cpu_layout,
+        }
+
+    # ================= INFERENCE =================
+    def preprocess(self, payload):
+        # из predict() может прийти уже декодированное изображение
+        if isinstance(payload, (bytes, bytearray)):
+            return self._preprocess.decode(payload)
+        return payload
+
+    def _perceptual(self, data: bytes):
+        image = self._preprocess.decode(data)
+        return image, dhash(image)
+
+    def predict_batch(self, images):
+        torch = self._torch
+        batch = self._buffers.to_tensor(images).to(self.device)
+        with torch.no_grad():
+            outputs = self.model(batch)
+            probs = torch.softmax(outputs, dim=1)
+            confidence, class_id = torch.max(probs, dim=1)
+        return list(zip(class_id.tolist(), confidence.tolist()))
+
+    async def predict(self, data: bytes):
+        await self.wait_ready()
+        cache = self.cache
+        if cache.check_weights():
+            await asyncio.to_thread(self.reload)
+            if self.phash is not None:
+                self.phash.clear(cache.model_version)
+
+        key = await asyncio.to_thread(hash_bytes, data)
+        prediction = cache.get(key)
+        if prediction is None:
+            prediction = await cache.load(key)
+        if prediction is None:
+            prediction = await self._predict_uncached(data)
+            cache.put(key, prediction)
+
+        self.record(key, prediction)
+        return prediction
+
+    async def _predict_uncached(self, data: bytes):
+        if self.phash is None:
+            return await self.scheduler.submit(data)
+
+        # декодируем один раз: картинка нужна и для хеша, и для модели
+        image, value = await asyncio.to_thread(self._perceptual, data)
+        prediction = self.phash.get(value)
+        if prediction is None:
+            prediction = await self.scheduler.submit(image)
+            if self.phash.put(value, prediction):
+                self._merge_phash()
+        return prediction
+
+    def _merge_phash(self):
+        # слияние хвоста - numpy по всему индексу (миллионы строк), не для event loop
+        if self._phash_merge is None or self._phash_merge.done():
+            self._phash_merge = asyncio.ensure_future(asyncio.to_thread(self.phash.merge))
+            self._phash_merge.add_done_callback(self._on_phash_merged)
+
+    @staticmethod
+    def _on_phash_merged(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error('phash merge failed', exc_info=future.exception())
+
+    def record(self, key: str, prediction):
+        if self.history is None:
+            return
+        class_id, confidence = prediction
+        self.history.add({
+            "image_hash": key,
+            "model_version": self.cache.model_version,
+            "predicted_label": self.labels[class_id],
+            "confidence": confidence,
+            "created_date": datetime.utcnow(),
+        })
+
+    async def recognize_video(self, source, sample_fps: float, min_confidence: float):
+        await self.wait_ready()
+        from pdd_app.ml.video import recognize_video
+
+        # декодирование и сборка батчей - в своём потоке, инференс - в потоках scheduler'а
+        # с их числом потоков torch и буферами
+        return await asyncio.to_thread(
+            recognize_video, source, self.scheduler.infer_blocking, self.labels,
+            sample_fps=sample_fps, batch_size=PREDICT_MAX_BATCH_SIZE, min_confidence=min_confidence,
+        )
+
+    def format_prediction(self, class_id: int, confidence: float):
+        return {
+            "name": self.labels[class_id],
+            "confidence": f"{round(confidence * 100, 2)}%"
+        }
+
+
+runtime = ModelRuntime()
@@ -0,0 +1,134 @@
+import queue
+import threading
+import time
+from typing import BinaryIO, Iterator, List, Tuple
+
+import numpy as np
+
+from pdd_app.ml.preprocess import SIZE
+
+_END = object()
+
+
+def iter_frames(source: BinaryIO, sample_fps: float, size=SIZE) -> Iterator[Tuple[float, np.ndarray]]:
+    """Потоково декодирует видео и отдаёт кадры (время, HWC uint8) с частотой sample_fps.
+
+    Масштабирование до size делает ffmpeg (swscale), полный кадр в numpy не попадает.
+    """
+    import av
+
+    interval = 1 / sample_fps if sample_fps > 0 else 0
+    with av.open(source, mode='r') as container:
+        if not container.streams.video:
+            raise ValueError('в файле нет видеодорожки')
+        stream = container.streams.video[0]
+        stream.thread_type = 'AUTO'
+        next_time = 0.0
+        for frame in container.decode(stream):
+            if frame.time is None or frame.time < next_time:
+                continue
+            next_time = frame.time + interval
+            width, height = size
+            yield frame.time, frame.to_ndarray(width=width, height=height, format='rgb24')
+
+
+def decode_errors() -> tuple:
+    """Ошибки битого или неподдерживаемого видео - вина клиента, а не сервера."""
+    try:
+        import av
+    except ImportError:
+        return (ValueError,)
+    return (ValueError, av.error.InvalidDataError, av.error.DecoderNotFoundError,
+            av.error.DemuxerNotFoundError, av.error.PatchWelcomeError)
+
+
+def build_timeline(samples: List[Tuple[float, int, float]], labels: List[str],
+                   min_confidence: float, max_gap: float):
+    """Склеивает подряд идущие кадры с одним знаком в отрезки."""
+    timeline = []
+    for timestamp, class_id, confidence in samples:
+        if confidence < min_confidence:
+            continue
+        last = timeline[-1] if timeline else None
+        if last and last["class_id"] == class_id and timestamp - last["end"] <= max_gap:
+            last["end"] = round(timestamp, 3)
+            last["frames"] += 1
+            last["confidence"] = max(last["confidence"], confidence)
+            continue
+        timeline.append({
+            "class_id": class_id,
+            "start": round(timestamp, 3),
+            "end": round(timestamp, 3),
+            "frames": 1,
+            "confidence": confidence,
+        })
+
+    for segment in timeline:
+        segment["name"] = labels[segment.pop("class_id")]
+        segment["confidence"] = f'{round(segment["confidence"] * 100, 2)}%'
+    return timeline
+
+
+def recognize_video(source: BinaryIO, predict_batch, labels: List[str], sample_fps: float,
+                    batch_size: int, min_confidence: float, queue_size: int = 64):
+    """Декодирование в отдельном потоке, инференс батчами в текущем - стадии идут параллельно."""
+    started = time.perf_counter()
+    frames: queue.Queue = queue.Queue(maxsize=queue_size)
+    errors = []
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # очередь ограничена: декодер ждёт инференс, но не вечно, если тот упал
+        while not stop.is_set():
+            try:
+                frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def decode():
+        try:
+            for item in iter_frames(source, sample_fps):
+                if not put(item):
+                    return
+        except Exception as e:
+            errors.append(e)
+        put(_END)
+
+    decoder = threading.Thread(target=decode, name='pdd-video-decode', daemon=True)
+    decoder.start()
+
+    samples = []
+    finished = False
+    try:
+        while not finished:
+            batch = [frames.get()]
+            # добираем то, что уже декодировано, не дожидаясь новых кадров
+            while len(batch) < batch_size:
+                try:
+                    batch.append(frames.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is _END:
+                batch.pop()
+                finished = True
+            if batch:
+                timestamps = [timestamp for timestamp, _ in batch]
+                predictions = predict_batch([image for _, image in batch])
+                samples.extend((t, c, p) for t, (c, p) in zip(timestamps, predictions))
+    finally:
+        stop.set()
+        decoder.join()
+
+    if errors:
+        raise errors[0]
+
+    interval = 1 / sample_fps if sample_fps > 0 else 0
+    return {
+        "frames_sampled": len(samples),
+        "duration": round(samples[-1][0], 3) if samples else 0.0,
+        "sample_fps": sample_fps,
+        "processing_s": round(time.perf_counter() - started, 3),
+        "timeline": build_timeline(samples, labels, min_confidence, max_gap=interval * 1.5),
+    }
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from pdd_app.db.models import AnswerOption, Base, Category, Question, QuestionDifficulty
+
+
+@pytest.fixture
+def engine(tmp_path):
+    # NullPool: соединение aiosqlite не переживает event loop, в котором открыто
+    engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "test.sqlite"}', poolclass=NullPool)
+
+    async def create():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create())
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def sessions(engine):
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+def seed_questions(sessions):
+    """seed_questions(categories, per_category, options) - категории с вопросами и вариантами ответа."""
+    def seed_sync(categories: int = 3, per_category: int = 20, options: int = 3):
+        asyncio.run(seed(categories, per_category, options))
+
+    async def seed(categories, per_category, options):
+        async with sessions() as db:
+            for c in range(categories):
+                category = Category(category_name=f'category {c}')
+                for q in range(per_category):
+                    category.questions.append(Question(
+                        text=f'question {c}.{q}', explanation='explanation',
+                        difficulty=QuestionDifficulty.easy,
+                        answer_options=[AnswerOption(text=f'option {o}', is_correct=o == 0)
+                                        for o in range(options)],
+                    ))
+                db.add(category)
+            await db.commit()
+
+    return seed_sync
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from pdd_app.api.questions import QuestionEmbed, question_out, question_select
+from pdd_app.db.check_queries import QueryCounter
+from pdd_app.db.schema import QuestionDetailSchema
+
+EMBED = [QuestionEmbed.answer_options, QuestionEmbed.category]
+
+
+def count_queries(engine, sessions, embed, limit: int):
+    async def run():
+        async with sessions() as db:
+            with QueryCounter(engine.sync_engine) as counter:
+                questions = (await db.scalars(question_select(embed).limit(limit))).all()
+                # сериализация как в роуте: ленивая подгрузка здесь упала бы в AsyncSession
+                out = [QuestionDetailSchema.model_validate(question_out(question, embed))
+                       for question in questions]
+            return counter.count, out
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize('embed', [[], [QuestionEmbed.answer_options], [QuestionEmbed.category], EMBED])
+def test_query_count_does_not_grow_with_limit(engine, sessions, seed_questions, embed):
+    seed_questions()
+    counts = {}
+    for limit in (1, 10, 30):
+        counts[limit], questions = count_queries(engine, sessions, embed, limit)
+        assert len(questions) == limit
+    assert len(set(counts.values())) == 1, counts
+
+
+def test_embedded_relations_are_loaded(engine, sessions, seed_questions):
+    seed_questions()
+    queries, questions = count_queries(engine, sessions, EMBED, 30)
+    # вопросы с категорией одним JOIN, варианты одним SELECT ... IN
+    assert queries == 2
+    assert all(len(question.answer_options) == 3 for question in questions)
+    assert all(question.category.id == question.category_id for question in questions)
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from pdd_app.api.category import category_router
+from pdd_app.api.video import video_router
+from pdd_app.db.database import get_db, get_read_db
+from pdd_app.db.models import Category, Video
+from pdd_app.db.response_cache import CACHE_HEADER, MemoryCacheBackend, response_cache
+
+
+@pytest.fixture
+def client(sessions, monkeypatch):
+    monkeypatch.setattr(response_cache, 'backend', MemoryCacheBackend())
+
+    async def seed():
+        async with sessions() as db:
+            db.add_all([Category(category_name='signs'), Category(category_name='markings')])
+            db.add(Video(title='crossroads', description='', url='https://example.com/1.mp4'))
+            await db.commit()
+
+    asyncio.run(seed())
+
+    async def session():
+        async with sessions() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(category_router)
+    app.include_router(video_router)
+    app.dependency_overrides[get_db] = session
+    app.dependency_overrides[get_read_db] = session
+    with TestClient(app) as client:
+        yield client
+
+
+def rename_category(sessions, category_id: int, name: str):
+    # запись другого воркера: мимо роута и без invalidate, только версия в базе
+    async def run():
+        async with sessions() as db:
+            category = await db.get(Category, category_id)
+            category.category_name = name
+            await db.commit()
+
+    asyncio.run(run())
+
+
+def test_repeat_get_is_served_from_cache(client):
+    first = client.get('/category/')
+    second = client.get('/category/')
+    assert first.headers[CACHE_HEADER] == 'MISS'
+    assert second.headers[CACHE_HEADER] == 'HIT'
+    assert second.json() == first.json()
+    assert second.headers['ETag'] == first.headers['ETag']
+
+
+def test_if_none_match_returns_304(client):
+    etag = client.get('/category/').headers['ETag']
+    response = client.get('/category/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.content == b''
+
+
+def test_write_changes_etag_and_serves_fresh_data(client):
+    etag = client.get('/category/').headers['ETag']
+    assert client.put('/category/1/', json={'id': 1, 'category_name': 'road signs'}).status_code == 200
+
+    response = client.get('/category/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.headers[CACHE_HEADER] == 'MISS'
+    assert response.json()['items'][0]['category_name'] == 'road signs'
+
+
+def test_write_from_another_session_changes_etag(client, sessions):
+    etag = client.get('/category/').headers['ETag']
+    rename_category(sessions, 2, 'lanes')
+
+    response = client.get('/category/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.json()['items'][1]['category_name'] == 'lanes'
+
+
+def test_like_does_not_invalidate_cache(client):
+    first = client.get('/videos/')
+    assert client.post('/videos/1/like').json()['total_likes'] == 1
+
+    # likes_count - счётчик: версия videos та же, список отстаёт не больше CACHE_TTL
+    assert client.get('/videos/', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    cached = client.get('/videos/')
+    assert cached.headers[CACHE_HEADER] == 'HIT'
+    assert cached.headers['ETag'] == first.headers['ETag']
@@ -0,0 +1,42 @@
+import struct
+import zlib
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from pdd_app.api.uploads import read_image_upload
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+
+def png_header(width: int, height: int) -> bytes:
+    # сигнатура, IHDR и IEND без пикселей: Image.open читает только заголовок
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + _chunk(b'IHDR', ihdr) + _chunk(b'IEND', b'')
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.post('/upload')
+    async def upload(request: Request):
+        data = await read_image_upload(request)
+        return {"bytes": len(data)}
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize('size', [8000, 12000, 20000])
+def test_huge_image_header_is_rejected(client, size):
+    response = client.post('/upload', files={'file': ('sign.png', png_header(size, size), 'image/png')})
+    assert response.status_code == 413
+
+
+def test_small_image_header_is_accepted(client):
+    response = client.post('/upload', files={'file': ('sign.png', png_header(64, 64), 'image/png')})
+    assert response.status_code == 200
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from pdd_app.api.auth import verify_password
+from pdd_app.api.users import user_router
+from pdd_app.db.database import get_db, get_read_db
+from pdd_app.db.models import User
+
+USER = {'username': 'aibek', 'email': 'aibek@example.com', 'password': 'secret123',
+        'first_name': 'Aibek', 'last_name': 'Asanov', 'age': 30}
+
+
+@pytest.fixture
+def client(sessions):
+    async def session():
+        async with sessions() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(user_router)
+    app.dependency_overrides[get_db] = session
+    app.dependency_overrides[get_read_db] = session
+    with TestClient(app) as client:
+        yield client
+
+
+def test_password_is_hashed_and_not_returned(client, sessions):
+    user_id = client.post('/users', json=USER).json()['user_id']
+
+    detail = client.get(f'/users/{user_id}').json()
+    listing = client.get('/users').json()['items']
+    assert 'password' not in detail
+    assert all('password' not in user for user in listing)
+    assert detail['username'] == USER['username']
+
+    async def stored_password():
+        async with sessions() as db:
+            return (await db.get(User, user_id)).password
+
+    stored = asyncio.run(stored_password())
+    assert stored != USER['password']
+    assert verify_password(USER['password'], stored)
+
+
+def test_openapi_has_no_password_in_responses(client):
+    schemas = client.get('/openapi.json').json()['components']['schemas']
+    assert 'password' not in schemas['UserProfileSchema']['properties']